@@ -0,0 +1,65 @@
+# benchmarks/bench_assets_table.py
+# Render time of the assets table against the number of tickers, LongTable vs fast path.
+#
+#   python benchmarks/bench_assets_table.py [--rows 100,1000,5000,20000] [--runs 3]
+#
+# Each case builds a PDF (in memory) that holds only the assets page of a synthetic year;
+# min wall time of doc.build and the resulting page count are reported.
+
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from reportlab.lib.pagesizes import A4  # noqa: E402
+from reportlab.lib.units import cm  # noqa: E402
+from reportlab.platypus import SimpleDocTemplate  # noqa: E402
+
+from modules.pdf_report.page_assets import make_assets_page  # noqa: E402
+from modules.pdf_report.year_stats import YearStats  # noqa: E402
+
+
+def _year_block(n: int) -> dict:
+    divs = [
+        {"ticker": f"T{i:06d}", "currency": "USD",
+         "dividend": [{"date": "2024-03-01", "currency": "USD", "amount": 1.0, "amountPln": 4.0}]}
+        for i in range(n)
+    ]
+    taxes = [
+        {"ticker": f"T{i:06d}", "currency": "USD",
+         "tax": [{"date": "2024-03-01", "currency": "USD", "amount": -0.15, "amountPln": -0.6}]}
+        for i in range(n)
+    ]
+    return {"year": "2024", "dividends": divs, "taxes": taxes}
+
+
+def _render(stats: YearStats, fast: bool) -> tuple[float, int]:
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4, leftMargin=1.6 * cm, rightMargin=1.6 * cm,
+                            topMargin=1.6 * cm, bottomMargin=1.6 * cm)
+    elements = make_assets_page(stats, fast=fast)
+    t0 = time.perf_counter()
+    doc.build(elements)
+    return time.perf_counter() - t0, doc.page
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", default="100,1000,5000,20000")
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'rows':>7} {'LongTable ms':>13} {'fast ms':>9} {'speedup':>8} {'pages':>6}")
+    for n in (int(x) for x in args.rows.split(",")):
+        stats = YearStats.from_year_block(_year_block(n))
+        slow = min(_render(stats, False) for _ in range(args.runs))
+        fast = min(_render(stats, True) for _ in range(args.runs))
+        print(f"{n:7d} {slow[0] * 1000:13.1f} {fast[0] * 1000:9.1f} {slow[0] / fast[0]:7.1f}x {fast[1]:6d}")
+
+
+if __name__ == "__main__":
+    main()
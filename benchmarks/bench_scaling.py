@@ -0,0 +1,148 @@
+# benchmarks/bench_scaling.py
+# End-to-end time and peak memory per pipeline stage against the input size.
+#
+#   python benchmarks/bench_scaling.py [--sizes 1000,10000,100000] [--accounts 1] [--noise 2]
+#       [--pdf-max-rows 200000] [--no-memory] [--out results.json]
+#
+# For every size a synthetic statement set is generated (synth_statements.py, fixed seed)
+# and run through the same stages as main.py (modules/pipeline.py), with NBP served by the
+# local stub (nbp_stub.py) and a fresh rate store, so the FX stage includes its HTTP round trips:
+#
+#   parse    streaming parse of all statements (pipeline.scan_all, no scan cache)
+#   fx       FxPlan + fetch from the stub + FxRates
+#   convert  conversion to PLN and aggregation (ReportBuilder)
+#   json     save_json of the nested report
+#   pdf      yearly PDF rendered from the in-memory rows (skipped above --pdf-max-rows)
+#
+# Wall times come from a plain run; peaks from a second, traced run (tracemalloc slows
+# allocation-heavy stages down several times). A stage's peak counts all live Python
+# allocations, including what earlier stages still hold.
+
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from modules import nbp, pipeline  # noqa: E402
+from modules.fx_planner import FxPlan  # noqa: E402
+from modules.fx_rates import FxRates  # noqa: E402
+from modules.pdf_report.annual_builder import build_yearly_pdf  # noqa: E402
+from modules.pdf_report.year_stats import YearStats  # noqa: E402
+from modules.report_builder import ReportBuilder  # noqa: E402
+
+import nbp_stub  # noqa: E402
+import synth_statements  # noqa: E402
+
+YEAR = "2024"
+STAGES = ("parse", "fx", "convert", "json", "pdf")
+
+
+def _pipeline(paths: list[str], work: Path, pdf: bool):
+    # Yields the name of each stage just before running it (None when done)
+    yield "parse"
+    scans = [s for s in pipeline.scan_all(paths, YEAR, 1) if s.period]
+
+    yield "fx"
+    nbp.CACHE_DIR = work / "nbp"
+    nbp._stores = {}
+    nbp_rates = FxPlan.from_scans(scans).fetch(nbp.fetch_nbp_rates_many)
+    fx = FxRates.from_nbp(nbp_rates)
+
+    yield "convert"
+    report = ReportBuilder()
+    for scan in scans:
+        pipeline.apply_scan(scan, report, fx, nbp_rates)
+        scan.release()
+    data = report.build()
+
+    yield "json"
+    pipeline.save_json(data, str(work / "out"), YEAR)
+
+    if pdf:
+        yield "pdf"
+        build_yearly_pdf(YearStats.from_store(report.rows(YEAR), YEAR), io.BytesIO())
+    yield None
+
+
+def _run(paths: list[str], work: Path, pdf: bool, memory: bool) -> dict[str, float]:
+    # {stage: seconds} or, with memory=True, {stage: peak bytes}
+    out = {}
+    stage = None
+    t0 = 0.0
+    if memory:
+        tracemalloc.start()
+    try:
+        for nxt in _pipeline(paths, work, pdf):
+            if stage is not None:
+                out[stage] = tracemalloc.get_traced_memory()[1] if memory else time.perf_counter() - t0
+            stage = nxt
+            if memory:
+                tracemalloc.reset_peak()
+            t0 = time.perf_counter()
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-stage time and memory against input size")
+    ap.add_argument("--sizes", default="1000,10000,100000", help="Dividend rows per case, e.g. 1000,...,1000000")
+    ap.add_argument("--accounts", type=int, default=1)
+    ap.add_argument("--tickers", type=int, default=500)
+    ap.add_argument("--noise", type=float, default=2.0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--pdf-max-rows", type=int, default=200_000)
+    ap.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc pass")
+    ap.add_argument("--out", help="Also write the results as JSON")
+    args = ap.parse_args()
+
+    for name in ("pipeline", "annual_pdf_builder"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    os.chdir(ROOT)  # fonts/ is looked up relative to the working directory
+    server, url = nbp_stub.serve()
+    nbp.configure(base_url=url)
+
+    results = []
+    print(f"{'rows':>8} {'files':>5} {'MB in':>6}  " + " ".join(f"{s + ' s':>9}" for s in STAGES)
+          + ("  " + " ".join(f"{s + ' MB':>10}" for s in STAGES) if not args.no_memory else ""))
+    for n in (int(x) for x in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            paths = [str(p) for p in synth_statements.generate(
+                tmp / "in", rows=n, tickers=args.tickers, accounts=args.accounts,
+                noise=args.noise, start=f"{YEAR}-01", seed=args.seed)]
+            size = sum(os.path.getsize(p) for p in paths)
+            pdf = n <= args.pdf_max_rows
+            requests_before = len(server.stub.requests)
+            times = _run(paths, tmp / "t", pdf, memory=False)
+            http_calls = len(server.stub.requests) - requests_before
+            peaks = {} if args.no_memory else _run(paths, tmp / "m", pdf, memory=True)
+        row = {"rows": n, "files": len(paths), "input_bytes": size, "http_requests": http_calls,
+               "seconds": times, "peak_bytes": peaks}
+        results.append(row)
+        line = f"{n:8d} {len(paths):5d} {size / 2**20:6.1f}  " + " ".join(
+            f"{times[s]:9.3f}" if s in times else f"{'-':>9}" for s in STAGES)
+        if peaks:
+            line += "  " + " ".join(
+                f"{peaks[s] / 2**20:10.1f}" if s in peaks else f"{'-':>10}" for s in STAGES)
+        print(line, flush=True)
+
+    server.shutdown()
+    if args.out:
+        Path(args.out).write_text(json.dumps({"stages": STAGES, "results": results}, indent=2), encoding="utf-8")
+        print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
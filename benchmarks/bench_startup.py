@@ -0,0 +1,67 @@
+# benchmarks/bench_startup.py
+# Measures the fixed per-process cost of the CLI: interpreter + imports.
+#
+#   python benchmarks/bench_startup.py [--runs 20]
+#
+# Each case runs in a fresh interpreter; min and median wall time are reported, plus the
+# heaviest imports of `import main` (python -X importtime) and whether ReportLab got loaded.
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CASES = {
+    "python (baseline)": [sys.executable, "-c", "pass"],
+    "import main": [sys.executable, "-c", "import main"],
+    "main.py --help": [sys.executable, "main.py", "--help"],
+    "import annual_builder (PDF stack)": [sys.executable, "-c", "import modules.pdf_report.annual_builder"],
+}
+
+
+def _time(cmd: list[str], runs: int) -> list[float]:
+    out = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+def _top_imports(n: int = 10) -> list[tuple[int, str]]:
+    res = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                         cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in res.stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=20)
+    args = ap.parse_args()
+
+    print(f"{'case':<36} {'min ms':>8} {'median ms':>10}")
+    for name, cmd in CASES.items():
+        t = _time(cmd, args.runs)
+        print(f"{name:<36} {min(t) * 1000:8.1f} {statistics.median(t) * 1000:10.1f}")
+
+    loaded = subprocess.run(
+        [sys.executable, "-c", "import sys, main; print('reportlab' in sys.modules)"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout.strip()
+    print(f"\nreportlab loaded by `import main`: {loaded}")
+    print("\nheaviest imports of `import main` (cumulative us):")
+    for us, name in _top_imports():
+        print(f"{us:10d}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# benchmarks/nbp_stub.py
+# Local stand-in for the NBP API, shared by the benchmarks and the tests (tests/conftest.py).
+#
+#   python benchmarks/nbp_stub.py [--port 8080]
+#   NBP_API_URL=http://127.0.0.1:8080/api python main.py ...
+#
+# Serves /api/exchangerates/rates/a/<CUR>/<start>/<end> and /api/exchangerates/tables/a/<start>/<end>
+# with NBP's status codes (404 when there is no data, 400 past the 93-day limit). Rates come
+# from NbpStub.rates ({'USD': {'2025-01-02': 4.10, ...}}) or, with synthetic=True, are
+# generated for every Polish business day, so the real client runs without the network.
+
+import argparse
+import json
+import re
+import sys
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from modules.fx_rates import CALENDAR  # noqa: E402
+
+BASE = {"USD": 4.0, "EUR": 4.3, "GBP": 5.0, "CHF": 4.5, "CAD": 2.9, "JPY": 0.027, "SEK": 0.38}
+MAX_DAYS = 93
+
+_RATES = re.compile(r"/exchangerates/rates/a/(\w+)/([\d-]+)/([\d-]+)$")
+_TABLES = re.compile(r"/exchangerates/tables/a/([\d-]+)/([\d-]+)$")
+
+
+def mid(currency: str, day: date) -> float:
+    return round(BASE.get(currency, 3.0) * (1 + (day.toordinal() % 97) / 1000), 4)
+
+
+def business_days(start: date, end: date) -> list[date]:
+    out = []
+    while start <= end:
+        if CALENDAR.is_business_day(start):
+            out.append(start)
+        start += timedelta(days=1)
+    return out
+
+
+class NbpStub:
+    def __init__(self, synthetic: bool = False):
+        self.synthetic = synthetic
+        self.rates = {}      # {'USD': {'2025-01-02': 4.10, ...}}, unless synthetic
+        self.fail = []       # statuses returned (and consumed) before normal answers
+        self.requests = []
+        self.peers = set()   # client (host, port) pairs, one per TCP connection
+        self.lock = threading.Lock()
+
+    def series(self, currency: str, start: date, end: date) -> list[tuple[str, float]]:
+        if self.synthetic:
+            if currency not in BASE:
+                return []
+            return [(d.isoformat(), mid(currency, d)) for d in business_days(start, end)]
+        lo, hi = start.isoformat(), end.isoformat()
+        return [(d, m) for d, m in sorted(self.rates.get(currency, {}).items()) if lo <= d <= hi]
+
+    def respond(self, path: str):
+        # (status, JSON payload or None)
+        with self.lock:
+            if self.fail:
+                return self.fail.pop(0), None
+        path = path.split("?")[0]
+        m = _RATES.search(path) or _TABLES.search(path)
+        if m is None:
+            return 400, None
+        try:
+            start, end = (date.fromisoformat(s) for s in m.groups()[-2:])
+        except ValueError:
+            return 400, None
+        if (end - start).days >= MAX_DAYS:
+            return 400, None
+        if m.re is _RATES:
+            cur = m.group(1).upper()
+            rows = [{"effectiveDate": d, "mid": v} for d, v in self.series(cur, start, end)]
+            return (200, {"table": "A", "code": cur, "rates": rows}) if rows else (404, None)
+        currencies = BASE if self.synthetic else sorted(self.rates)
+        by_day = {}
+        for cur in currencies:
+            for d, v in self.series(cur, start, end):
+                by_day.setdefault(d, []).append({"code": cur, "mid": v})
+        tables = [{"table": "A", "effectiveDate": d, "rates": r} for d, r in sorted(by_day.items())]
+        return (200, tables) if tables else (404, None)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.requests.append(self.path)
+            stub.peers.add(self.client_address)
+        status, payload = stub.respond(self.path)
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b"404 NotFound - Brak danych"
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json" if payload is not None else "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(stub: NbpStub | None = None, port: int = 0, host: str = "127.0.0.1") -> tuple[ThreadingHTTPServer, str]:
+    # Start the stub on a background thread; returns (server, base URL for NbpClient).
+    # server.stub is the NbpStub (synthetic rates when none is given).
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.stub = stub or NbpStub(synthetic=True)
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/api"
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serve deterministic NBP rates locally")
+    ap.add_argument("--port", type=int, default=8080)
+    args = ap.parse_args()
+    server, url = serve(port=args.port)
+    print(f"NBP stub at {url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# benchmarks/synth_statements.py
+# Deterministic generator of IBKR-like activity statements for benchmarks.
+#
+#   python benchmarks/synth_statements.py OUT_DIR --rows 100000 [--tickers 500]
+#       [--currencies USD,EUR,GBP,CHF] [--months 12] [--accounts 1] [--noise 2.0]
+#       [--start 2024-01] [--seed 1]
+#
+# One file per account and month (U<account>_<YYYYMM>_<YYYYMM>.csv) with the period header,
+# `rows` dividend rows in total (each followed by its withholding tax row), per-currency
+# Total lines and `noise` non-dividend lines per dividend row (trades, positions, fees...).
+# The same arguments always produce byte-identical files.
+
+import argparse
+import calendar
+import random
+from pathlib import Path
+
+_NOISE = (
+    "Trades,Data,Order,Stocks,{cur},{t},\"{d}, 10:31:02\",{q},{p},{p},-{v},-1,{v},0,0,O",
+    "Open Positions,Data,Summary,Stocks,{cur},{t},{q},1,{p},{v},{p},{v},0,",
+    "Fees,Data,Other Fees,{cur},{d},Market data fee,-{p}",
+    "Interest,Data,{cur},{d},{cur} Credit Interest for {m},{p}",
+    "Mark-to-Market Performance Summary,Data,Stocks,{t},{q},{q},{p},{p},0,0,0,0,0,{p},",
+    "Financial Instrument Information,Data,Stocks,{t},{t} INC,1234{q},US{q}0000000,NASDAQ,1,COMMON,",
+)
+_HEADER = (
+    "Statement,Header,Field Name,Field Value",
+    "Statement,Data,BrokerName,Interactive Brokers LLC",
+    "Statement,Data,Title,Activity Statement",
+)
+
+
+def _tickers(n: int, rng: random.Random) -> list[str]:
+    out = set()
+    while len(out) < n:
+        out.add("".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.randint(2, 5))))
+    return sorted(out)
+
+
+def _months(start: str, count: int) -> list[tuple[int, int]]:
+    y, m = (int(x) for x in start.split("-"))
+    out = []
+    for _ in range(count):
+        out.append((y, m))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+
+def generate(out_dir, rows: int = 10_000, tickers: int = 200, currencies=("USD", "EUR", "GBP", "CHF"),
+             months: int = 12, accounts: int = 1, noise: float = 2.0, start: str = "2024-01",
+             seed: int = 1) -> list[Path]:
+    rng = random.Random(seed)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    names = _tickers(tickers, rng)
+    # every ticker pays in one currency, the first one being the most common
+    ccy = {t: currencies[0] if rng.random() < 0.6 else rng.choice(currencies) for t in names}
+    periods = _months(start, months)
+    files = accounts * len(periods)
+    paths = []
+    for a in range(accounts):
+        account = f"U{10000000 + a * 7919}"
+        for i, (y, m) in enumerate(periods):
+            n = rows // files + (1 if a * len(periods) + i < rows % files else 0)
+            last = calendar.monthrange(y, m)[1]
+            lines = list(_HEADER)
+            lines.append(f'Statement,Data,Period,"{calendar.month_name[m]} 1, {y} - {calendar.month_name[m]} {last}, {y}"')
+            divs, taxes, totals = [], [], {}
+            for _ in range(n):
+                t = rng.choice(names)
+                cur = ccy[t]
+                d = f"{y}-{m:02d}-{rng.randint(1, last):02d}"
+                amount = round(rng.uniform(0.5, 400.0), 2)
+                tax = round(amount * 0.15, 2)
+                per_share = round(rng.uniform(0.05, 3.0), 4)
+                desc = f"{t}(US{rng.randint(10**8, 10**9 - 1)}) Cash Dividend {cur} {per_share} per Share (Ordinary Dividend)"
+                divs.append(f"Dividends,Data,{cur},{d},{desc},{amount}")
+                taxes.append(f"Withholding Tax,Data,{cur},{d},{desc} - US Tax,-{tax},")
+                totals[cur] = totals.get(cur, 0.0) + amount
+                for _ in range(int(noise) + (rng.random() < noise % 1)):
+                    lines.append(rng.choice(_NOISE).format(
+                        cur=cur, t=t, d=d, m=calendar.month_abbr[m], q=rng.randint(1, 500),
+                        p=round(rng.uniform(1, 500), 2), v=round(rng.uniform(10, 50000), 2),
+                    ))
+            lines.append("Dividends,Header,Currency,Date,Description,Amount")
+            lines += divs
+            lines += [f"Dividends,Data,Total in {c},,,{round(v, 2)}" for c, v in sorted(totals.items())]
+            lines.append("Withholding Tax,Header,Currency,Date,Description,Amount,Code")
+            lines += taxes
+            lines.append("Withholding Tax,Data,Total,,,0,")
+            path = out_dir / f"{account}_{y}{m:02d}_{y}{m:02d}.csv"
+            path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+            paths.append(path)
+    return paths
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Write synthetic IBKR statements")
+    ap.add_argument("out_dir")
+    ap.add_argument("--rows", type=int, default=10_000, help="Dividend rows in total (each has a tax row)")
+    ap.add_argument("--tickers", type=int, default=200)
+    ap.add_argument("--currencies", default="USD,EUR,GBP,CHF")
+    ap.add_argument("--months", type=int, default=12)
+    ap.add_argument("--accounts", type=int, default=1)
+    ap.add_argument("--noise", type=float, default=2.0, help="Non-dividend lines per dividend row")
+    ap.add_argument("--start", default="2024-01", help="First month (YYYY-MM)")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+    paths = generate(args.out_dir, args.rows, args.tickers, tuple(args.currencies.split(",")),
+                     args.months, args.accounts, args.noise, args.start, args.seed)
+    print(f"wrote {len(paths)} statements to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,114 +1,212 @@
 import argparse
-from pathlib import Path
-from datetime import datetime
-import json
+import os
+import sys
+from contextlib import contextmanager
 from modules.logger_module import get_logger
-from modules.date_parser import parse_report_period
-from modules.dividend_processor import process_dividend_line, add_dividend_to_report
-from modules.tax_processor import process_tax_line, add_tax_to_report
-from modules.nbp import fetch_nbp_rates_range
+from modules import metrics
+from modules.scan_cache import ScanCache
+from modules.nbp import NbpError, configure as configure_nbp, get_store, prefetch_rates
+from modules.fx_rates import MissingRateError
+from modules.pipeline import (ALL_YEARS, build_report, collect_years, parse_years, process_broker_report, write_outputs,
+                              year_stores)
+from modules.report_builder import ReportBuilder
+from modules.exports import SINKS
+from modules.batch import discover_accounts, process_accounts, write_index
 
 logger = get_logger("main")
 
-def _merge_fx(yb_fx: dict, ccy: str, nbp_list: list[dict]):
-    arr = yb_fx.setdefault(ccy, [])
-    for it in nbp_list:
-        rec = {"date": it["effectiveDate"], "rate": float(it["mid"])}
-        if not any(r.get("date") == rec["date"] for r in arr):
-            arr.append(rec)
-    arr.sort(key=lambda x: x["date"])
-
-def process_broker_report(file_path: str, report_data: dict, target_year: str | None = None):
-    lines = Path(file_path).read_text(encoding="utf-8-sig").splitlines()
-    info = parse_report_period(file_path, lines)
-    if not info:
-        logger.warning(f"Could not parse report period for: {file_path}")
-        return
-    year = info["year"]
-    years = report_data.setdefault("years", [])
-    yb = next((y for y in years if y.get("year") == year), None)
-    if not yb:
-        yb = {"year": year, "fromDate": info["fromDate"], "toDate": info["toDate"], "dividends": [], "taxes": [], "fx": {}}
-        years.append(yb)
-
-    # collect currencies & min/max dates
-    ccys=set(); min_d=None; max_d=None
-    for raw in lines:
-        if raw.startswith(("Dividends,Data,","Withholding Tax,Data,")):
-            parts=[p.strip().strip('"') for p in raw.split(",")]
-            if len(parts)<6: continue
-            ccy=parts[2].upper(); date=parts[3]
-            if target_year and not date.startswith(target_year): continue
-            ccys.add(ccy)
-            try:
-                d = datetime.strptime(date, "%Y-%m-%d").date()
-                min_d = d if min_d is None or d<min_d else min_d
-                max_d = d if max_d is None or d>max_d else max_d
-            except Exception:
-                pass
-
-    # fetch & merge fx
-    if ccys and min_d and max_d:
-        start=min_d.strftime("%Y-%m-%d"); end=max_d.strftime("%Y-%m-%d")
-        for c in sorted(ccys):
-            if c=="PLN":
-                _merge_fx(yb["fx"], c, [{"effectiveDate": start, "mid": 1.0}])
-            else:
-                _merge_fx(yb["fx"], c, fetch_nbp_rates_range(c, start, end))
-
-    # parse rows
-    for raw in lines:
-        if raw.startswith("Dividends,Data,"):
-            rec = process_dividend_line(raw, yb["fx"], year)
-            if rec and (not target_year or rec["date"].startswith(target_year)):
-                add_dividend_to_report(report_data, year, rec)
-        elif raw.startswith("Withholding Tax,Data,"):
-            rec = process_tax_line(raw, yb["fx"], year)
-            if rec and (not target_year or rec["date"].startswith(target_year)):
-                add_tax_to_report(report_data, year, rec)
-
-def process_all_reports(folder: str, target_year: str | None = None) -> dict:
-    data={"years": []}
-    for p in sorted(Path(folder).glob("*.csv")):
-        logger.info(f"Processing {p.name}")
-        process_broker_report(str(p), data, target_year)
-    return data
-
-def save_json(report_data: dict, out_dir: str, year: str) -> str:
-    Path(out_dir).mkdir(parents=True, exist_ok=True)
-    path = Path(out_dir) / f"divs_{year}.json"
-    path.write_text(json.dumps(report_data, ensure_ascii=False, indent=2), encoding="utf-8")
-    logger.info(f"Saved JSON: {path}")
-    return str(path)
-
-def main():
-    ap = argparse.ArgumentParser()
+def _nbp_options() -> argparse.ArgumentParser:
+    # FX options shared by the report run and prefetch-rates
+    p = argparse.ArgumentParser(add_help=False)
+    p.add_argument("--nbp-concurrency", help="Parallel NBP API requests (default: 4)", type=int, default=4)
+    p.add_argument("--fx-bulk", help="Fetch whole NBP A tables (all currencies per request)", action="store_true")
+    p.add_argument("--offline", help="Use only cached/snapshot rates, fail if one is missing", action="store_true")
+    p.add_argument("--fx-snapshot", help="Import an FX snapshot file into the local rate cache", metavar="PATH")
+    return p
+
+def _setup_fx(args):
+    configure_nbp(concurrency=args.nbp_concurrency, bulk=args.fx_bulk, offline=args.offline)
+    if args.fx_snapshot:
+        n = get_store().import_snapshot(args.fx_snapshot)
+        logger.info(f"Imported {n} rates from {args.fx_snapshot}")
+
+def _profile_options() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(add_help=False)
+    p.add_argument("--profile", metavar="PATH", help="Write per-stage timings and counters as JSON to PATH")
+    p.add_argument("--cprofile", metavar="PATH", help="Also record a cProfile of the run to PATH (pstats format)")
+    return p
+
+@contextmanager
+def _profiling(args):
+    # --profile / --cprofile around the body; both files are written even if it fails
+    if args.profile:
+        metrics.enable()
+    profiler = None
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+            logger.info(f"Saved cProfile: {args.cprofile} (python -m pstats {args.cprofile})")
+        if args.profile:
+            logger.info(f"Saved metrics: {metrics.write(args.profile)}")
+            metrics.disable()
+
+def prefetch_main(argv: list[str]):
+    ap = argparse.ArgumentParser(prog="main.py prefetch-rates", parents=[_nbp_options()],
+                                 description="Fill the local NBP rate cache ahead of time")
+    ap.add_argument("--from", dest="from_date", required=True, help="First day (YYYY-MM-DD)")
+    ap.add_argument("--to", dest="to_date", required=True, help="Last day (YYYY-MM-DD)")
+    ap.add_argument("--currencies", help="Comma-separated codes (default: all table A currencies)")
+    ap.add_argument("--snapshot", help="Also write the cached rates of the range to a snapshot file", metavar="PATH")
+    args = ap.parse_args(argv)
+
+    _setup_fx(args)
+    currencies = [c.strip().upper() for c in args.currencies.split(",") if c.strip()] if args.currencies else None
+    try:
+        counts = prefetch_rates(args.from_date, args.to_date, currencies)
+    except NbpError as e:
+        logger.error(f"Prefetch failed: {e}")
+        raise SystemExit(1)
+    logger.info(f"Cached {sum(counts.values())} rates for {len(counts)} currencies, {args.from_date}..{args.to_date}")
+    if args.snapshot:
+        n = get_store().export_snapshot(args.snapshot, args.from_date, args.to_date, currencies)
+        logger.info(f"Saved snapshot: {args.snapshot} ({n} rates)")
+
+def batch_main(argv: list[str]):
+    ap = argparse.ArgumentParser(prog="main.py batch", parents=[_nbp_options(), _profile_options()],
+                                 description="Process many accounts with one FX plan and a worker pool")
+    ap.add_argument("source", help="Folder with one sub-folder (or U<account>_*.csv prefix) per account, "
+                    "or a JSON manifest {account: folder or [statements]}")
+    ap.add_argument("--out", help="Output root: <out>/<account>/ plus <out>/index.json (default: batch_reports)",
+                    default="batch_reports")
+    ap.add_argument("--years", help="Years to report, e.g. 2019-2025 or 2021,2023 (default: all found)")
+    ap.add_argument("--workers", help="Worker processes for parsing and PDFs (default: CPU count)",
+                    type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--no-cache", help="Parse every statement again, without the cached partials", action="store_true")
+    ap.add_argument("--json-only", help="Write the JSON only; ReportLab is never imported", action="store_true")
+    args = ap.parse_args(argv)
+    try:
+        years = parse_years(args.years) if args.years else ALL_YEARS
+        accounts = discover_accounts(args.source)
+    except ValueError as e:
+        ap.error(str(e))
+    if not accounts:
+        ap.error(f"No statements found in {args.source}")
+
+    _setup_fx(args)
+    with _profiling(args):
+        results = process_accounts(accounts, years, max(1, args.workers),
+                                   None if args.no_cache else ScanCache(), args.out, args.json_only)
+    index = write_index(args.out, results)
+    failed = [r["account"] for r in results if r["status"] == "failed"]
+    logger.info(f"Batch done: {len(results) - len(failed)} of {len(results)} accounts, index: {index}")
+    if failed:
+        logger.error(f"Failed accounts: {', '.join(failed)}")
+        raise SystemExit(1)
+
+def serve_main(argv: list[str]):
+    ap = argparse.ArgumentParser(prog="main.py serve", parents=[_nbp_options()],
+                                 description="Serve reports over HTTP on localhost with warm caches")
+    ap.add_argument("--host", help="Address to listen on (default: 127.0.0.1)", default="127.0.0.1")
+    ap.add_argument("--port", help="Port to listen on (default: 8765)", type=int, default=8765)
+    ap.add_argument("--workers", help="Report jobs run at the same time (default: 2)", type=int, default=2)
+    ap.add_argument("--queue", help="Jobs waiting for a worker before requests get 503 (default: 16)",
+                    type=int, default=16)
+    ap.add_argument("--max-body-mb", help="Largest accepted request body in MB (default: 64)", type=int, default=64)
+    ap.add_argument("--root", help="Requests may only read folders inside this one (default: current directory)",
+                    default=".")
+    args = ap.parse_args(argv)
+
+    import asyncio
+    from modules.report_service import ReportService
+    _setup_fx(args)
+    service = ReportService(args.workers, args.queue, args.max_body_mb * 2**20, root=args.root)
+    service.warm_up()
+
+    def ready(server):
+        port = server.sockets[0].getsockname()[1]
+        logger.info(f"Serving reports on http://{args.host}:{port} ({service.workers} workers, queue {service.queue_size}, "
+                    f"folders under {service.root})")
+
+    try:
+        asyncio.run(service.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        logger.info("Stopped")
+
+def main(argv: list[str] | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "prefetch-rates":
+        return prefetch_main(argv[1:])
+    if argv and argv[0] == "batch":
+        return batch_main(argv[1:])
+    if argv and argv[0] == "serve":
+        return serve_main(argv[1:])
+
+    ap = argparse.ArgumentParser(parents=[_nbp_options(), _profile_options()],
+                                 epilog="Other commands: prefetch-rates --from YYYY-MM-DD --to YYYY-MM-DD, "
+                                        "batch ACCOUNTS_DIR_OR_MANIFEST, serve [--port 8765]")
     ap.add_argument("file", nargs="?", help="Path to single CSV report (optional)")
-    ap.add_argument("--year", help="Collect all reports from broker_reports/ for year", type=str)
-    args = ap.parse_args()
+    years = ap.add_mutually_exclusive_group()
+    years.add_argument("--year", help="Collect all reports from broker_reports/ for year", type=str)
+    years.add_argument("--years", help="Like --year for several years in one pass, e.g. 2019-2025 or 2021,2023")
+    years.add_argument("--all-years", help="Like --years for every year found in broker_reports/", action="store_true")
+    ap.add_argument("--jobs", help="Parse statements in N worker processes (default: 1)", type=int, default=1)
+    ap.add_argument("--no-cache", help="Parse every statement again, without the cached partials", action="store_true")
+    ap.add_argument("--export", help="Also write flat rows per year: jsonl (rows_<year>.jsonl) and/or columnar "
+                    "(rows_<year>.columns/), streamed while processing", choices=sorted(SINKS), action="append", default=[])
+    ap.add_argument("--json-only", help="Write the JSON only; ReportLab is never imported", action="store_true")
+    args = ap.parse_args(argv)
+    if args.years:
+        try:
+            args.years = parse_years(args.years)
+        except ValueError as e:
+            ap.error(str(e))
+
+    _setup_fx(args)
+    try:
+        with _profiling(args):
+            run(args)
+    except (NbpError, MissingRateError) as e:
+        logger.error(f"FX rates unavailable: {e}")
+        raise SystemExit(1)
+
+def run(args):
+    sinks = [SINKS[name]("tax_reports") for name in dict.fromkeys(args.export)]
+    try:
+        _run(args, sinks)
+    finally:
+        for sink in sinks:
+            sink.close()
+            for path in sink.paths():
+                logger.info(f"Saved export: {path}")
 
-    if args.year:
-        data = process_all_reports("broker_reports", args.year)
+def _run(args, sinks):
+    if args.year or args.years or args.all_years:
+        years = [args.year] if args.year else args.years or ALL_YEARS
+        report = collect_years("broker_reports", years, args.jobs, None if args.no_cache else ScanCache(), sinks)
+        data = build_report(report)
         if not data.get("years"): 
             logger.info("No data found for given year"); return
-        y = data["years"][0]["year"]
-        json_path = save_json(data, "tax_reports", y)
-        from modules.pdf_report.annual_builder import build_yearly_pdf_from_json
-        build_yearly_pdf_from_json(json_path, f"tax_reports/report_{y}_full.pdf")
+        write_outputs(data, year_stores(report, data), "report_{year}_full.pdf", args.json_only)
         return
 
     if not args.file:
-        logger.error("No input file. Use: python main.py <file.csv> or --year <YYYY>")
+        logger.error("No input file. Use: python main.py <file.csv>, --year <YYYY> or --years <YYYY-YYYY>")
         return
 
-    data = {"years": []}
-    process_broker_report(args.file, data, None)
+    report = ReportBuilder(sinks)
+    process_broker_report(args.file, report, None)
+    with metrics.span("aggregate"):
+        data = report.build()
     if not data.get("years"):
         logger.info("No data collected from file"); return
-    y = data["years"][0]["year"]
-    json_path = save_json(data, "tax_reports", y)
-    from modules.pdf_report.annual_builder import build_yearly_pdf_from_json
-    build_yearly_pdf_from_json(json_path, f"tax_reports/report_{y}.pdf")
+    write_outputs(data, year_stores(report, data), "report_{year}.pdf", args.json_only)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,229 @@
+# modules/batch.py
+# Batch runs (main.py batch): account discovery, the run itself and the summary index.
+#
+# Accounts come from a root directory or a JSON manifest:
+#   root/U1234567/*.csv        every sub-folder with statements is one account
+#   root/U7654321_*.csv        loose statements are grouped by their U<account> prefix
+#   accounts.json              {"U1234567": "clients/a", "U7654321": ["x.csv", "y.csv"]}
+#                              (folders or statement lists, relative to the manifest)
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import NamedTuple
+
+from modules import metrics
+from modules.money_utils import from_minor
+from modules.nbp import NbpError
+from modules.pipeline import ALL_YEARS, apply_scan, build_report, fetch_rates, write_outputs, year_stores
+from modules.report_builder import ReportBuilder
+from modules.row_store import DIVIDEND, TAX
+from modules.scan_cache import ScanCache
+from modules.statement_parser import StatementScan, scan_rows, scan_statement
+
+logger = logging.getLogger("batch")
+
+
+class Account(NamedTuple):
+    name: str
+    paths: tuple[str, ...]  # statements, sorted
+
+
+def _statements(folder: Path) -> tuple[str, ...]:
+    return tuple(str(p) for p in sorted(folder.glob("*.csv")))
+
+
+def discover_accounts(source) -> list[Account]:
+    # Accounts sorted by name; raises ValueError for a missing source or duplicate names
+    source = Path(source)
+    found: dict[str, list[str]] = {}
+
+    def add(name: str, paths):
+        if name in found:
+            raise ValueError(f"Account {name} is listed twice in {source}")
+        found[name] = list(paths)
+
+    if source.is_dir():
+        loose: dict[str, list[str]] = {}
+        for p in _statements(source):
+            loose.setdefault(Path(p).name.split("_")[0], []).append(p)
+        for d in sorted(source.iterdir()):
+            if d.is_dir() and (paths := _statements(d)):
+                add(d.name, paths)
+        for name, paths in loose.items():
+            add(name, paths)
+    elif source.is_file():
+        try:
+            manifest = json.loads(source.read_text(encoding="utf-8"))
+        except ValueError as e:
+            raise ValueError(f"Invalid manifest {source}: {e}") from None
+        if not isinstance(manifest, dict):
+            raise ValueError(f"Invalid manifest {source}: expected {{account: folder or [statements]}}")
+        base = source.parent
+        for name, entry in manifest.items():
+            if isinstance(entry, str):
+                add(name, _statements(base / entry))
+            else:
+                add(name, sorted(str(base / p) for p in entry))
+    else:
+        raise ValueError(f"No such accounts folder or manifest: {source}")
+    return [Account(name, tuple(paths)) for name, paths in sorted(found.items())]
+
+
+def year_summary(store) -> dict:
+    # Totals of one year's RowStore for the index
+    return {
+        "dividends": store.count(DIVIDEND),
+        "taxes": store.count(TAX),
+        "dividendsPln": from_minor(store.total(DIVIDEND)),
+        "taxesPln": from_minor(store.total(TAX)),
+    }
+
+
+def write_index(out_dir, results: list[dict]) -> str:
+    # out_dir/index.json: counts per status plus one entry per account
+    statuses: dict[str, int] = {}
+    for r in results:
+        statuses[r["status"]] = statuses.get(r["status"], 0) + 1
+    path = Path(out_dir) / "index.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"statuses": statuses, "accounts": results}, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+    return str(path)
+
+
+def _parse_files(paths: list[str], target_year) -> list[StatementScan]:
+    # Worker task: parse the statements of one account
+    return [scan_statement(p, target_year) for p in paths]
+
+
+def _write_account(data: dict, stores: dict, out_dir: str, json_only: bool) -> list[str]:
+    # Worker task: JSON and PDF files of one account
+    return write_outputs(data, stores, "report_{year}_full.pdf", json_only, out_dir)
+
+
+def _submit(pool, fn, *args):
+    # fn(*args) in the process pool, or run right away when there is none (workers=1)
+    from concurrent.futures import Future
+    if pool is not None and metrics.active() is None:
+        return pool.submit(fn, *args)
+    f = Future()
+    if pool is not None:
+        # merge the worker's metrics, then resolve with fn's own result
+        def done(task):
+            try:
+                result, recorded = task.result()
+            except BaseException as e:
+                f.set_exception(e)
+                return
+            metrics.merge(recorded)
+            f.set_result(result)
+
+        pool.submit(metrics.in_worker, fn, *args).add_done_callback(done)
+        return f
+    try:
+        f.set_result(fn(*args))
+    except Exception as e:
+        f.set_exception(e)
+    return f
+
+
+def process_accounts(accounts: list[Account], years=ALL_YEARS, workers: int = 1, cache: ScanCache | None = None,
+                     out_dir: str = "batch_reports", json_only: bool = False) -> list[dict]:
+    # Batch run: the statements of all accounts are parsed in a pool of `workers` processes,
+    # FX is planned and fetched once for all of them, then every account is converted here
+    # and written (JSON + PDF into out_dir/<account>/) in the pool. Any error of one account
+    # (unreadable statement, missing rate, failed write) is recorded in its result entry and
+    # does not stop the others. If the shared FX fetch fails, rates are fetched per account.
+    target = None if years is ALL_YEARS else set(years)
+    results = {a.name: {"account": a.name, "statements": len(a.paths), "status": "ok"} for a in accounts}
+
+    def fail(name: str, e: Exception):
+        logger.error(f"Account {name} failed: {e}")
+        results[name].update(status="failed", error=f"{type(e).__name__}: {e}")
+
+    from concurrent.futures import ProcessPoolExecutor
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        # 1) parse: cache hits here, new or changed statements in the pool (in full when cached)
+        jobs = {}
+        with metrics.span("cache.lookup"):
+            for acc in accounts:
+                try:
+                    hits = [cache.get(p, target) for p in acc.paths] if cache else [None] * len(acc.paths)
+                except Exception as e:
+                    fail(acc.name, e)
+                    continue
+                todo = [p for p, scan in zip(acc.paths, hits) if scan is None]
+                metrics.count("cache.hits", len(hits) - len(todo))
+                metrics.count("cache.misses", len(todo))
+                jobs[acc.name] = (acc.paths, hits, todo, _submit(pool, _parse_files, todo, None if cache else target))
+        scans = {}
+        with metrics.span("parse"):
+            for name, (paths, hits, todo, future) in jobs.items():
+                try:
+                    parsed = dict(zip(todo, future.result()))
+                    out = []
+                    for p, scan in zip(paths, hits):
+                        if scan is None:
+                            scan = parsed[p]
+                            if cache:
+                                cache.put(p, scan)
+                                scan = scan_rows(p, scan.rows(), target)
+                        if scan.period:
+                            out.append(scan)
+                        else:
+                            logger.warning(f"Could not parse report period for: {scan.path}")
+                except Exception as e:
+                    fail(name, e)
+                    continue
+                metrics.count("statements", len(hits))
+                scans[name] = out
+        if cache:
+            with metrics.span("cache.save"):
+                cache.save()
+
+        # 2) one FX plan and fetch for every account
+        try:
+            shared = fetch_rates([scan for ss in scans.values() for scan in ss])
+        except NbpError as e:
+            logger.warning(f"Shared FX fetch failed ({e}), fetching rates per account")
+            shared = None
+
+        # 3) convert here, write in the pool while the next account is converted
+        writes = {}
+        for name, ss in scans.items():
+            try:
+                nbp_rates, fx = shared or fetch_rates(ss)
+                with metrics.span("convert"):
+                    report = ReportBuilder()
+                    for scan in ss:
+                        apply_scan(scan, report, fx, nbp_rates, ALL_YEARS if target is None else target)
+                        scan.release()
+                data = build_report(report)
+                stores = year_stores(report, data)
+                results[name]["years"] = {year: year_summary(store) for year, store in stores.items()}
+                if not data["years"]:
+                    results[name]["status"] = "empty"
+                    continue
+                writes[name] = _submit(pool, _write_account, data, {} if json_only else stores,
+                                       str(Path(out_dir) / name), json_only)
+            except Exception as e:
+                fail(name, e)
+        with metrics.span("batch.write"):
+            for name, future in writes.items():
+                try:
+                    results[name]["files"] = future.result()
+                except Exception as e:
+                    fail(name, e)
+                    continue
+                expected = len(results[name]["years"]) * (1 if json_only else 2)
+                if len(results[name]["files"]) < expected:
+                    fail(name, RuntimeError("some PDFs were not built, see the log"))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    metrics.count("accounts", len(accounts))
+    return [results[a.name] for a in accounts]
@@ -42,19 +42,31 @@ def _iter_rows(lines: Iterable) -> Iterable[List[str]]:
         for row in csv.reader([str(item)]):
             yield [c.strip() for c in row]
 
+def _period_from_row(row: List[str]) -> Optional[dict]:
+    if len(row) >= 4 and row[0] == "Statement" and row[1] == "Data" and row[2] == "Period":
+        field = row[3]
+        m = _PERIOD_RE.search(field) or _PERIOD_RE.search(field.strip().strip('"'))
+        if not m:
+            return None
+        left, right = m.groups()
+        d1, d2 = _convert_long_date(left), _convert_long_date(right)
+        if d1 and d2:
+            return {"fromDate": d1, "toDate": d2, "year": d1[:4]}
+    return None
+
+def parse_period_line(line: str) -> Optional[dict]:
+    # Parse a single 'Statement,Data,Period,...' line (used by the streaming parser)
+    for row in _iter_rows([line]):
+        return _period_from_row(row)
+    return None
+
 def parse_report_period(file_path: str, lines: Iterable) -> Optional[dict]:
     # Find 'Statement,Data,Period,"January 1, 2025 - January 31, 2025"'
     try:
         for row in _iter_rows(lines):
-            if len(row) >= 4 and row[0] == "Statement" and row[1] == "Data" and row[2] == "Period":
-                field = row[3]
-                m = _PERIOD_RE.search(field) or _PERIOD_RE.search(field.strip().strip('"'))
-                if not m:
-                    continue
-                left, right = m.groups()
-                d1, d2 = _convert_long_date(left), _convert_long_date(right)
-                if d1 and d2:
-                    return {"fromDate": d1, "toDate": d2, "year": d1[:4]}
+            info = _period_from_row(row)
+            if info:
+                return info
         logger.warning(f"Could not detect report period for file: {file_path}")
         return None
     except Exception as e:
@@ -1,42 +1,11 @@
-import logging
-from modules.money_utils import money
+from modules.fx_rates import cash_record
+from modules.statement_parser import DividendRow, parse_cash_line
 
-logger = logging.getLogger("dividend_processor")
-
-def parse_ticker_from_desc(desc: str) -> str:
-    # Extract ticker before '('
-    try:
-        return desc.split("(")[0].strip()
-    except Exception:
-        return "UNKNOWN"
-
-def get_fx_rate(fx: dict, currency: str, date: str) -> float:
-    # Look up 'fx' dict: { 'USD': [{'date':'YYYY-MM-DD','rate':float}, ...], ... }
-    arr = fx.get(currency.upper()) or []
-    for r in arr:
-        if r.get("date") == date:
-            return float(r.get("rate", 1.0))
-    return float(arr[-1].get("rate", 1.0)) if arr else 1.0
-
-def process_dividend_line(line: str, fx: dict, report_year: str) -> dict | None:
+def process_dividend_line(line: str, fx, report_year: str) -> dict | None:
     # Parse 'Dividends,Data,USD,2025-01-02,<desc>,4.4'
-    parts = [p.strip().strip('"') for p in line.split(",")]
-    if len(parts) < 6: return None
-    currency, date, desc, amt = parts[2], parts[3], parts[4], parts[5]
-    if not date.startswith(report_year): return None
-    try:
-        amount = money(float(amt))
-    except Exception:
-        return None
-    rate = get_fx_rate(fx, currency, date)
-    rec = {
-        "ticker": parse_ticker_from_desc(desc),
-        "currency": currency,
-        "date": date,
-        "amount": amount,
-        "amountPln": money(amount * rate),
-    }
-    return rec
+    row = parse_cash_line(line, DividendRow)
+    if row is None or not row.date.startswith(report_year): return None
+    return cash_record(row, fx)
 
 def add_dividend_to_report(report_data: dict, year: str, rec: dict):
     years = report_data.setdefault("years", [])
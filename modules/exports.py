@@ -0,0 +1,150 @@
+# modules/exports.py
+# Flat exports written while statements are processed, next to the nested JSON.
+#
+#   jsonl    -> tax_reports/rows_<year>.jsonl: one dividend or tax row per line
+#   columnar -> tax_reports/rows_<year>.columns/: one raw typed array per column plus
+#               schema.json (dtypes, scales, ticker/currency dictionaries)
+#
+# Sinks receive every batch of converted rows (ReportBuilder.add_rows) and append it to
+# the open files, so memory does not grow with the output. A sink removes the exports of
+# its kind left in out_dir by an earlier run, so only this run's years remain.
+
+import json
+import shutil
+import sys
+from array import array
+from datetime import date
+from pathlib import Path
+
+from modules.money_utils import from_minor
+
+KINDS = ("dividend", "tax")
+_EPOCH = date(1970, 1, 1).toordinal()
+
+# column -> array typecode (fixed-size on all supported platforms)
+COLUMNS = {
+    "kind": "b",        # 0 = dividend, 1 = tax
+    "date": "i",        # days since 1970-01-01
+    "ticker": "i",      # index into schema 'tickers'
+    "currency": "i",    # index into schema 'currencies'
+    "amount": "q",      # minor units of `currency`
+    "amount_pln": "q",  # grosze
+}
+_DTYPES = {"b": "int8", "i": "int32", "q": "int64"}
+
+
+def _clear(out_dir: Path, pattern: str):
+    # Remove earlier exports matching pattern (files or .columns directories)
+    for p in out_dir.glob(pattern):
+        if p.is_dir():
+            shutil.rmtree(p)
+        else:
+            p.unlink(missing_ok=True)
+
+
+class JsonlSink:
+    def __init__(self, out_dir: str):
+        self.out_dir = Path(out_dir)
+        self._files: dict = {}
+        _clear(self.out_dir, "rows_*.jsonl")
+
+    def _file(self, year: str):
+        fh = self._files.get(year)
+        if fh is None:
+            self.out_dir.mkdir(parents=True, exist_ok=True)
+            fh = self._files[year] = open(self.out_dir / f"rows_{year}.jsonl", "w", encoding="utf-8")
+        return fh
+
+    def write(self, year: str, rows):
+        # rows: (kind, date, ticker, currency, amount, amount_pln) with amounts in minor units
+        self._file(year).writelines(
+            json.dumps({
+                "year": year, "kind": KINDS[k], "date": d, "ticker": t, "currency": c,
+                "amount": from_minor(a), "amountPln": from_minor(p),
+            }, ensure_ascii=False) + "\n"
+            for k, d, t, c, a, p in rows
+        )
+
+    def paths(self) -> list[str]:
+        return [fh.name for fh in self._files.values()]
+
+    def close(self):
+        for fh in self._files.values():
+            fh.close()
+
+
+class _YearColumns:
+    def __init__(self, path: Path):
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.files = {name: open(path / f"{name}.bin", "wb") for name in COLUMNS}
+        self.ids: tuple[dict, dict] = ({}, {})
+        self.rows = 0
+
+    def write(self, rows):
+        cols = {name: array(code) for name, code in COLUMNS.items()}
+        tickers, currencies = self.ids
+        for k, d, t, c, a, p in rows:
+            cols["kind"].append(k)
+            cols["date"].append(date.fromisoformat(d).toordinal() - _EPOCH)
+            cols["ticker"].append(tickers.setdefault(t, len(tickers)))
+            cols["currency"].append(currencies.setdefault(c, len(currencies)))
+            cols["amount"].append(a)
+            cols["amount_pln"].append(p)
+        for name, col in cols.items():
+            col.tofile(self.files[name])
+        self.rows += len(cols["kind"])
+
+    def close(self):
+        for fh in self.files.values():
+            fh.close()
+        schema = {
+            "format": "dividend-rows-columns",
+            "version": 1,
+            "rows": self.rows,
+            "byteorder": sys.byteorder,
+            "columns": {name: {"file": f"{name}.bin", "dtype": _DTYPES[code]} for name, code in COLUMNS.items()},
+            "scales": {"amount": 2, "amount_pln": 2},
+            "kinds": list(KINDS),
+            "tickers": list(self.ids[0]),
+            "currencies": list(self.ids[1]),
+        }
+        (self.path / "schema.json").write_text(json.dumps(schema, indent=1), encoding="utf-8")
+
+
+class ColumnarSink:
+    def __init__(self, out_dir: str):
+        self.out_dir = Path(out_dir)
+        self._years: dict[str, _YearColumns] = {}
+        _clear(self.out_dir, "rows_*.columns")
+
+    def write(self, year: str, rows):
+        cols = self._years.get(year)
+        if cols is None:
+            cols = self._years[year] = _YearColumns(self.out_dir / f"rows_{year}.columns")
+        cols.write(rows)
+
+    def paths(self) -> list[str]:
+        return [str(c.path) for c in self._years.values()]
+
+    def close(self):
+        for cols in self._years.values():
+            cols.close()
+
+
+SINKS = {"jsonl": JsonlSink, "columnar": ColumnarSink}
+
+
+def read_columns(path) -> dict:
+    # Load a rows_<year>.columns directory: {'schema': {...}, <column>: array}
+    path = Path(path)
+    schema = json.loads((path / "schema.json").read_text(encoding="utf-8"))
+    out = {"schema": schema}
+    for name, spec in schema["columns"].items():
+        col = array(COLUMNS[name])
+        with open(path / spec["file"], "rb") as fh:
+            col.fromfile(fh, schema["rows"])
+        if schema["byteorder"] != sys.byteorder:
+            col.byteswap()
+        out[name] = col
+    return out
@@ -0,0 +1,95 @@
+# modules/fx_planner.py
+# Plans FX fetches for a whole batch of statements before any row is converted.
+#
+# Every statement contributes the date range it needs per currency; the planner covers
+# the union per currency with the fewest API-legal windows, so each currency is fetched
+# once per window instead of once per file.
+
+import bisect
+from datetime import date, timedelta
+
+from modules.fx_rates import CALENDAR, MAX_STALE_DAYS
+from modules.nbp import NBP_MAX_DAYS, split_range
+
+
+def rate_window(min_date: str, max_date: str) -> tuple[date, date]:
+    # Rates needed to convert rows dated min_date..max_date (D-1 rule)
+    return (
+        CALENDAR.previous_business_day(date.fromisoformat(min_date)),
+        CALENDAR.previous_business_day(date.fromisoformat(max_date)),
+    )
+
+
+class FxPlan:
+    def __init__(self):
+        self._ranges: dict[str, list[tuple[date, date]]] = {}
+
+    @classmethod
+    def from_scans(cls, scans) -> "FxPlan":
+        plan = cls()
+        for scan in scans:
+            plan.add_scan(scan)
+        return plan
+
+    def add(self, currency: str, start: date, end: date):
+        cur = currency.upper()
+        if cur != "PLN":
+            self._ranges.setdefault(cur, []).append((start, end))
+
+    def add_scan(self, scan):
+        # Each window starts MAX_STALE_DAYS early: when NBP published nothing on the first
+        # D-1 day, the conversion falls back to an earlier rate, which must be fetched too
+        for cur, (lo, hi) in scan.currencies.items():
+            start, end = rate_window(lo, hi)
+            self.add(cur, start - timedelta(days=MAX_STALE_DAYS), end)
+
+    def currencies(self) -> list[str]:
+        return sorted(self._ranges)
+
+    def windows(self, currency: str) -> list[tuple[str, str]]:
+        # Greedy cover of the requested ranges with windows of at most NBP_MAX_DAYS days:
+        # each window starts at the first uncovered date, which gives the fewest windows.
+        out = []  # [start, last needed date, last date the window may reach]
+        for start, end in sorted(self._ranges.get(currency.upper(), [])):
+            if out and start <= out[-1][2]:
+                if end <= out[-1][2]:
+                    out[-1][1] = max(out[-1][1], end)
+                    continue
+                out[-1][1] = out[-1][2]
+                start = out[-1][2] + timedelta(days=1)
+            for s, e in split_range(start, end):
+                out.append([s, e, s + timedelta(days=NBP_MAX_DAYS - 1)])
+        return [(s.isoformat(), e.isoformat()) for s, e, _ in out]
+
+    def requests(self) -> list[tuple[str, str, str]]:
+        return [(cur, start, end) for cur in self.currencies() for start, end in self.windows(cur)]
+
+    def fetch(self, fetch_many) -> dict[str, list[dict]]:
+        # fetch_many([(currency, start, end), ...]) -> {(currency, start, end): RAW NBP list};
+        # returns {currency: sorted, deduped RAW list}
+        results = fetch_many(self.requests())
+        out = {}
+        for cur in self.currencies():
+            by_date = {}
+            for start, end in self.windows(cur):
+                for r in results[(cur, start, end)]:
+                    by_date[r["effectiveDate"]] = r
+            out[cur] = [by_date[d] for d in sorted(by_date)]
+        return out
+
+
+def rates_between(rates: list[dict], start: str, end: str) -> list[dict]:
+    # Slice of a sorted RAW NBP list with start <= effectiveDate <= end
+    lo = bisect.bisect_left(rates, start, key=lambda r: r["effectiveDate"])
+    hi = bisect.bisect_right(rates, end, key=lambda r: r["effectiveDate"])
+    return rates[lo:hi]
+
+
+def rates_used(rates: list[dict], start: str, end: str) -> list[dict]:
+    # rates_between plus the last earlier rate when none was published on start itself:
+    # rows of that day are converted at the earlier rate (the MAX_STALE_DAYS fallback)
+    lo = bisect.bisect_left(rates, start, key=lambda r: r["effectiveDate"])
+    hi = bisect.bisect_right(rates, end, key=lambda r: r["effectiveDate"])
+    if lo and (lo == len(rates) or rates[lo]["effectiveDate"] != start):
+        lo -= 1
+    return rates[lo:hi]
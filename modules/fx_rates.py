@@ -0,0 +1,260 @@
+# modules/fx_rates.py
+# Per-currency FX rate tables with bisect lookup, backed by the Polish business-day calendar.
+#
+# Conversion rule (art. 11a PIT): an amount received on day D is converted at the NBP
+# average rate published on the last business day before D, i.e. the last published
+# rate on or before D-1.
+
+import bisect
+import heapq
+import logging
+from datetime import date, timedelta
+
+from modules.money_utils import RATE_SCALE, convert_minor, from_minor, rate_units
+
+logger = logging.getLogger("fx_rates")
+
+# How far (in calendar days) the last published rate may lag behind the expected
+# business day before a lookup fails instead of falling back to it
+MAX_STALE_DAYS = 7
+
+
+class MissingRateError(LookupError):
+    pass
+
+
+def _easter(year: int) -> date:
+    # Anonymous Gregorian algorithm (Meeus/Jones/Butcher)
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def polish_holidays(year: int) -> set[date]:
+    # Statutory non-working days in Poland (NBP does not publish table A on these days).
+    easter = _easter(year)
+    days = {
+        date(year, 1, 1),
+        date(year, 5, 1),
+        date(year, 5, 3),
+        date(year, 8, 15),
+        date(year, 11, 1),
+        date(year, 11, 11),
+        date(year, 12, 25),
+        date(year, 12, 26),
+        easter,
+        easter + timedelta(days=1),   # Easter Monday
+        easter + timedelta(days=49),  # Pentecost
+        easter + timedelta(days=60),  # Corpus Christi
+    }
+    if year >= 2011:
+        days.add(date(year, 1, 6))
+    if year >= 2025:
+        days.add(date(year, 12, 24))
+    if year == 2018:
+        days.add(date(2018, 11, 12))  # one-off holiday (100 years of independence)
+    return days
+
+
+class BusinessCalendar:
+    # Sorted ordinals of business days, precomputed per year on first use.
+
+    def __init__(self):
+        self._years: dict[int, list[int]] = {}
+
+    def _days(self, year: int) -> list[int]:
+        days = self._years.get(year)
+        if days is None:
+            holidays = polish_holidays(year)
+            d = date(year, 1, 1)
+            days = []
+            while d.year == year:
+                if d.weekday() < 5 and d not in holidays:
+                    days.append(d.toordinal())
+                d += timedelta(days=1)
+            self._years[year] = days
+        return days
+
+    def is_business_day(self, d: date) -> bool:
+        days = self._days(d.year)
+        i = bisect.bisect_left(days, d.toordinal())
+        return i < len(days) and days[i] == d.toordinal()
+
+    def previous_business_day(self, d: date) -> date:
+        # Last business day strictly before d
+        year = d.year
+        days = self._days(year)
+        i = bisect.bisect_left(days, d.toordinal())
+        while i == 0:
+            year -= 1
+            days = self._days(year)
+            i = len(days)
+        return date.fromordinal(days[i - 1])
+
+
+CALENDAR = BusinessCalendar()
+
+
+def _ordinal(day) -> int:
+    if isinstance(day, date):
+        return day.toordinal()
+    return date.fromisoformat(day).toordinal()
+
+
+class RateTable:
+    # Sorted date ordinals and rates of one currency (floats and RATE_SCALE integers).
+
+    __slots__ = ("currency", "dates", "rates", "units", "_warned")
+
+    def __init__(self, currency: str, dates: list[int], rates: list[float]):
+        self.currency = currency.upper()
+        self.dates = dates
+        self.rates = rates
+        self.units = [rate_units(r) for r in rates]
+        self._warned: set[int] = set()  # expected dates already reported as missing
+
+    @classmethod
+    def from_records(cls, currency: str, records: list[dict]) -> "RateTable":
+        # records: [{'date': 'YYYY-MM-DD', 'rate': float}, ...] as stored in the JSON 'fx' block
+        pairs = sorted(
+            (_ordinal(r["date"]), float(r.get("rate", 1.0)))
+            for r in records or []
+            if r.get("date")
+        )
+        return cls(currency, [p[0] for p in pairs], [p[1] for p in pairs])
+
+    @classmethod
+    def from_nbp(cls, currency: str, rates: list[dict]) -> "RateTable":
+        # rates: sorted RAW NBP list [{'effectiveDate','mid'}, ...]
+        return cls(
+            currency,
+            [_ordinal(r["effectiveDate"]) for r in rates],
+            [float(r["mid"]) for r in rates],
+        )
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def rate_for(self, day) -> float:
+        return self.rates[self.index_for(day)]
+
+    def units_for(self, day) -> int:
+        return self.units[self.index_for(day)]
+
+    def index_for(self, day) -> int:
+        # Position of the last published rate on or before day-1. A gap in the table
+        # (NBP skipped a day, a range was not fetched) falls back to the previous rate
+        # for up to MAX_STALE_DAYS, with one warning per missing date; older is an error.
+        d = _ordinal(day)
+        i = bisect.bisect_left(self.dates, d) - 1
+        if i < 0:
+            raise MissingRateError(f"No {self.currency} rate published before {day}")
+        expected = CALENDAR.previous_business_day(date.fromordinal(d)).toordinal()
+        if self.dates[i] < expected:
+            if expected - self.dates[i] > MAX_STALE_DAYS:
+                raise MissingRateError(
+                    f"No {self.currency} rate for {date.fromordinal(expected)} (needed for {day}); "
+                    f"the last one is from {date.fromordinal(self.dates[i])}"
+                )
+            if expected not in self._warned:
+                self._warned.add(expected)
+                logger.warning(
+                    f"{self.currency} rate for {date.fromordinal(expected)} is missing, "
+                    f"using {date.fromordinal(self.dates[i])} for {day}"
+                )
+        return i
+
+
+class FxRates:
+    # Rate tables for all currencies of a year block, built once from the JSON 'fx' dict.
+
+    def __init__(self, tables: dict[str, RateTable] | None = None):
+        self.tables = tables or {}
+
+    @classmethod
+    def from_fx(cls, fx: dict) -> "FxRates":
+        return cls({c.upper(): RateTable.from_records(c, arr) for c, arr in (fx or {}).items()})
+
+    @classmethod
+    def from_nbp(cls, rates: dict[str, list[dict]]) -> "FxRates":
+        return cls({c.upper(): RateTable.from_nbp(c, arr) for c, arr in rates.items()})
+
+    def table(self, currency: str) -> RateTable:
+        table = self.tables.get(currency.upper())
+        if table is None:
+            raise MissingRateError(f"No {currency.upper()} rates loaded")
+        return table
+
+    def rate_for(self, currency: str, day) -> float:
+        if currency.upper() == "PLN":
+            return 1.0
+        return self.table(currency).rate_for(day)
+
+    def units_for(self, currency: str, day) -> int:
+        # Rate as an integer in RATE_SCALE units (see money_utils.convert_minor)
+        if currency.upper() == "PLN":
+            return RATE_SCALE
+        return self.table(currency).units_for(day)
+
+
+def _by_date(rec: dict) -> str:
+    return rec["date"]
+
+
+class RateMerger:
+    # Incremental date-keyed merge of NBP ranges into the JSON 'fx' dict.
+    # Lists stay sorted by date; duplicates are dropped via a per-currency set of seen dates.
+
+    def __init__(self, fx: dict | None = None):
+        self.fx = fx if fx is not None else {}
+        self._seen = {c: {r["date"] for r in arr} for c, arr in self.fx.items()}
+
+    def add(self, currency: str, nbp_list: list[dict]) -> int:
+        # nbp_list in RAW NBP format [{'effectiveDate','mid'}, ...]; returns number of new dates
+        arr = self.fx.setdefault(currency, [])
+        seen = self._seen.setdefault(currency, set())
+        new = []
+        for it in nbp_list:
+            d = it["effectiveDate"]
+            if d not in seen:
+                seen.add(d)
+                new.append({"date": d, "rate": float(it["mid"])})
+        if not new:
+            return 0
+        new.sort(key=_by_date)  # NBP ranges arrive sorted, so this is a linear pass
+        if not arr or arr[-1]["date"] < new[0]["date"]:
+            arr.extend(new)
+        else:
+            arr[:] = heapq.merge(arr, new, key=_by_date)
+        return len(new)
+
+
+def get_fx_rate(fx, currency: str, date: str) -> float:
+    # fx: FxRates or the raw JSON 'fx' dict { 'USD': [{'date':'YYYY-MM-DD','rate':float}, ...] }.
+    # Pass FxRates when converting many rows; a dict is indexed on every call.
+    if not isinstance(fx, FxRates):
+        fx = FxRates.from_fx(fx)
+    return fx.rate_for(currency, date)
+
+
+def cash_record(row, fx) -> dict:
+    # Parsed DividendRow/TaxRow -> {'ticker','currency','date','amount','amountPln'} converted
+    # at the last NBP rate published before its date; fx as in get_fx_rate
+    if not isinstance(fx, FxRates):
+        fx = FxRates.from_fx(fx)
+    pln = convert_minor(row.amount, fx.units_for(row.currency, row.date))
+    return {
+        "ticker": row.ticker,
+        "currency": row.currency,
+        "date": row.date,
+        "amount": from_minor(row.amount),
+        "amountPln": from_minor(pln),
+    }
@@ -0,0 +1,152 @@
+# modules/metrics.py
+# Opt-in run metrics: timing spans and counters, written as JSON (main.py --profile).
+#
+#   with metrics.span("fx.fetch"):
+#       ...
+#   metrics.count("http.bytes", len(body))
+#
+# Off by default: span() then returns a shared no-op context manager and count() returns
+# at once, so instrumented code pays one global lookup per call. Call sites stay coarse
+# (per stage, per file, per HTTP request), never per row.
+#
+# Worker processes record into their own Metrics: a pool task runs through in_worker(),
+# which returns the task's result with what it recorded, and the parent merge()s that.
+
+import json
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+
+_NOOP = nullcontext()
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: dict[str, list] = {}  # name -> [seconds, calls]
+        self.counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str) -> "_Span":
+        return _Span(self, name)
+
+    def add_time(self, name: str, seconds: float):
+        with self._lock:
+            entry = self.spans.get(name)
+            if entry is None:
+                self.spans[name] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def snapshot(self) -> dict:
+        # Picklable copy of the spans and counters, for merge() in another process
+        with self._lock:
+            return {"spans": {k: list(v) for k, v in self.spans.items()}, "counters": dict(self.counters)}
+
+    def merge(self, recorded: dict):
+        with self._lock:
+            for name, (seconds, calls) in recorded["spans"].items():
+                entry = self.spans.setdefault(name, [0.0, 0])
+                entry[0] += seconds
+                entry[1] += calls
+            for name, n in recorded["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self) -> dict:
+        # Spans of threads overlap with the main thread, so they need not add up to wall_seconds
+        with self._lock:
+            return {
+                "version": 1,
+                "argv": sys.argv[1:],
+                "wall_seconds": round(time.perf_counter() - self.started, 6),
+                "peak_rss_kb": _peak_rss_kb(),
+                "spans": {k: {"seconds": round(s, 6), "calls": c} for k, (s, c) in sorted(self.spans.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+
+class _Span:
+    __slots__ = ("metrics", "name", "t0")
+
+    def __init__(self, metrics: Metrics, name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+_active: Metrics | None = None
+
+
+def enable() -> Metrics:
+    global _active
+    _active = Metrics()
+    return _active
+
+
+def disable():
+    global _active
+    _active = None
+
+
+def active() -> Metrics | None:
+    return _active
+
+
+def span(name: str):
+    # Times the with-block into `name` (seconds and calls add up across calls and threads)
+    m = _active
+    return _NOOP if m is None else _Span(m, name)
+
+
+def count(name: str, n: int = 1):
+    m = _active
+    if m is not None:
+        m.count(name, n)
+
+
+def in_worker(fn, *args):
+    # Pool task wrapper: fn(*args) under fresh metrics of this process -> (result, snapshot).
+    # Only submit it while metrics are active in the parent, which merge()s the snapshot.
+    m = enable()
+    try:
+        return fn(*args), m.snapshot()
+    finally:
+        disable()
+
+
+def merge(recorded: dict):
+    # Add the spans and counters of a worker's snapshot to the active metrics
+    m = _active
+    if m is not None:
+        m.merge(recorded)
+
+
+def write(path) -> str:
+    # Write the active metrics as JSON; returns the path
+    data = _active.to_dict() if _active is not None else {}
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    Path(path).write_text(json.dumps(data, indent=2), encoding="utf-8")
+    return str(path)
+
+
+def _peak_rss_kb() -> int | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
@@ -1,6 +1,79 @@
 from decimal import Decimal, ROUND_HALF_EVEN
 
+# Amounts are carried as integer minor units (grosze, cents): exact sums, no per-row Decimal.
+# FX rates are scaled integers (NBP publishes at most 6 decimals for table A).
+RATE_SCALE = 10 ** 8
+
+
+def div_half_even(n: int, d: int) -> int:
+    # n / d rounded half-to-even (d > 0); floor divmod keeps the remainder non-negative
+    q, r = divmod(n, d)
+    if 2 * r > d or (2 * r == d and q & 1):
+        q += 1
+    return q
+
+
+def parse_minor(text: str) -> int:
+    # '4.4' -> 440, '-0.665' -> -66; more than two decimals round half-even
+    s = text.strip()
+    neg = s.startswith("-")
+    if s[:1] in ("-", "+"):
+        s = s[1:]
+    if "e" in s or "E" in s:
+        q = Decimal(s).quantize(Decimal("0.01"), rounding=ROUND_HALF_EVEN)
+        units = int(q.scaleb(2))
+        return -units if neg else units
+    whole, _, frac = s.partition(".")
+    if not (whole + frac).isdigit():
+        raise ValueError(f"Invalid amount: {text!r}")
+    units = int(whole or "0") * 100 + int(frac[:2].ljust(2, "0"))
+    rest = frac[2:].rstrip("0")
+    if rest and (rest[0] > "5" or (rest[0] == "5" and (len(rest) > 1 or units & 1))):
+        units += 1
+    return -units if neg else units
+
+
+def to_minor(value) -> int:
+    # int/float/str/Decimal amount -> minor units (half-even at the second decimal)
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, float):
+        return parse_minor(repr(value))
+    if isinstance(value, Decimal):
+        return int(value.quantize(Decimal("0.01"), rounding=ROUND_HALF_EVEN).scaleb(2))
+    return parse_minor(str(value))
+
+
+def from_minor(units: int) -> float:
+    # 1804 -> 18.04 (the shortest float repr of an exact two-decimal value)
+    return units / 100
+
+
+def format_minor(units: int) -> str:
+    # 1804 -> '18.04', -5 -> '-0.05'
+    sign = "-" if units < 0 else ""
+    whole, cents = divmod(abs(units), 100)
+    return f"{sign}{whole}.{cents:02d}"
+
+
+def rate_units(rate: float) -> int:
+    return round(rate * RATE_SCALE)
+
+
+def convert_minor(units: int, rate_scaled: int) -> int:
+    # amount (minor units) * FX rate (RATE_SCALE units) -> PLN grosze, half-even
+    return div_half_even(units * rate_scaled, RATE_SCALE)
+
+
+def convert_many(amounts: list[int], rates_scaled: list[int]) -> list[int]:
+    return [div_half_even(a * r, RATE_SCALE) for a, r in zip(amounts, rates_scaled)]
+
+
+def percent_minor(units: int, percent: int) -> int:
+    # units * percent% rounded half-even, e.g. the 19% / 9% PIT-38 amounts
+    return div_half_even(units * percent, 100)
+
+
 def money(value) -> float:
     # Round to two decimals with bankers' rounding (half-even).
-    q = Decimal(str(value)).quantize(Decimal("0.01"), rounding=ROUND_HALF_EVEN)
-    return float(q)
+    return from_minor(to_minor(value))
@@ -1,117 +1,364 @@
 # modules/nbp.py
-# Fetches FX rates from NBP API with on-disk caching.
+# Fetches FX rates from NBP API with on-disk caching (modules/rate_store).
+#
+# Importing this module is cheap and has no side effects: http.client/ssl, the thread
+# pool and SQLite are loaded on first use, the cache directory is created on first write.
+
+from __future__ import annotations
 
 import json
+import logging
+import os
+import threading
+import time
+from datetime import date, timedelta
 from pathlib import Path
-import urllib.request
-from urllib.error import HTTPError, URLError
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+from modules import metrics
+
+if TYPE_CHECKING:
+    import http.client
+    from concurrent.futures import ThreadPoolExecutor
+
+    from modules.rate_store import RateStore
+
+logger = logging.getLogger("nbp")
 
 # Кэш можно переопределить в тестах через monkeypatch
 CACHE_DIR = Path("cache") / "nbp"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+# Can point to a local stand-in server, e.g. NBP_API_URL=http://127.0.0.1:8080/api
+NBP_API_URL = os.environ.get("NBP_API_URL", "https://api.nbp.pl/api")
 
-def _cache_path(currency: str, start: str, end: str) -> Path:
-    return CACHE_DIR / f"{currency.upper()}_{start}_{end}.json"
+NBP_MAX_DAYS = 93  # NBP rejects ranges longer than 93 days
 
 
-def _http_get_json(url: str) -> dict | None:
-    req = urllib.request.Request(url, headers={"Accept": "application/json"})
-    try:
-        with urllib.request.urlopen(req, timeout=20) as resp:
-            raw = resp.read().decode("utf-8")
-        return json.loads(raw)
-    except (URLError, HTTPError, ValueError):
-        return None
+def split_range(start: date, end: date, max_days: int = NBP_MAX_DAYS) -> list[tuple[date, date]]:
+    # Cut start..end (inclusive) into consecutive windows of at most max_days days
+    out = []
+    while start <= end:
+        stop = min(end, start + timedelta(days=max_days - 1))
+        out.append((start, stop))
+        start = stop + timedelta(days=1)
+    return out
 
-# modules/nbp.py
 
-def fetch_nbp_rates_range(currency: str, start: str, end: str) -> list[dict]:
-    cur = currency.upper()
+class NbpError(RuntimeError):
+    pass
+
+
+class NbpOfflineError(NbpError):
+    pass
+
+
+class NbpClient:
+    """
+    NBP API client with keep-alive connections (one per worker thread), a bounded
+    number of concurrent requests, exponential-backoff retries and an overall deadline.
+    """
+
+    def __init__(self, base_url: str = NBP_API_URL, concurrency: int = 4, timeout: float = 10.0,
+                 retries: int = 3, backoff: float = 0.5, deadline: float = 120.0, bulk: bool = False,
+                 offline: bool = False):
+        u = urlsplit(base_url)
+        self._https = u.scheme == "https"
+        self._netloc = u.netloc
+        self._prefix = u.path.rstrip("/")
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self.bulk = bulk  # fetch whole A tables (all currencies) instead of per-currency series
+        self.offline = offline  # never touch the network, see fetch_nbp_rates_many
+        self._local = threading.local()
+        self._conns: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._pool: ThreadPoolExecutor | None = None
+
+    def _conn(self, timeout: float) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            import http.client
+            cls = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+            conn = cls(self._netloc, timeout=timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._conns.append(conn)
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn
+
+    def _drop_conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+            with self._lock:
+                if conn in self._conns:
+                    self._conns.remove(conn)
+
+    def get_json(self, path: str, deadline_at: float | None = None):
+        # Returns parsed JSON, None for 404 (NBP: no data in range); raises NbpError otherwise
+        if self.offline:
+            raise NbpOfflineError(f"NBP {path}: offline mode")
+        if deadline_at is None:
+            deadline_at = time.monotonic() + self.deadline
+        import http.client
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                raise NbpError(f"NBP {path}: deadline exceeded")
+            metrics.count("http.requests")
+            try:
+                with metrics.span("http.request"):
+                    conn = self._conn(min(self.timeout, remaining))
+                    conn.request("GET", self._prefix + path, headers={"Accept": "application/json"})
+                    resp = conn.getresponse()
+                    body = resp.read()
+                metrics.count("http.bytes", len(body))
+                if resp.will_close:
+                    self._drop_conn()
+            except (OSError, http.client.HTTPException) as e:
+                self._drop_conn()
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if resp.status == 200:
+                    try:
+                        return json.loads(body.decode("utf-8"))
+                    except ValueError as e:
+                        raise NbpError(f"NBP {path}: invalid JSON ({e})") from None
+                if resp.status == 404:
+                    return None
+                error = f"HTTP {resp.status}"
+                if resp.status < 500 and resp.status != 429:
+                    raise NbpError(f"NBP {path}: {error}")
+            attempt += 1
+            metrics.count("http.errors")
+            if attempt > self.retries:
+                raise NbpError(f"NBP {path}: {error} (gave up after {attempt} attempts)")
+            delay = self.backoff * 2 ** (attempt - 1)
+            if time.monotonic() + delay >= deadline_at:
+                raise NbpError(f"NBP {path}: {error} (deadline exceeded)")
+            logger.warning(f"NBP {path}: {error}, retry {attempt}/{self.retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def fetch_rates(self, currency: str, start: str, end: str, deadline_at: float | None = None) -> list[dict]:
+        # RAW NBP format [{'effectiveDate','mid'}, ...] sorted by date
+        payload = self.get_json(f"/exchangerates/rates/a/{currency.upper()}/{start}/{end}?format=json", deadline_at)
+        rates = []
+        if isinstance(payload, dict):
+            for r in payload.get("rates", []):
+                ed = r.get("effectiveDate")
+                mid = r.get("mid")
+                if ed and mid is not None:
+                    rates.append({"effectiveDate": ed, "mid": float(mid)})
+        rates.sort(key=lambda x: x["effectiveDate"])
+        return rates
+
+    def fetch_table(self, start: str, end: str, deadline_at: float | None = None) -> dict[str, list[dict]]:
+        # All table A currencies for start..end: {currency: RAW NBP list sorted by date}
+        payload = self.get_json(f"/exchangerates/tables/a/{start}/{end}?format=json", deadline_at)
+        out: dict[str, list[dict]] = {}
+        for table in payload if isinstance(payload, list) else []:
+            ed = table.get("effectiveDate")
+            for r in table.get("rates", []):
+                code = (r.get("code") or "").upper()
+                mid = r.get("mid")
+                if ed and code and mid is not None:
+                    out.setdefault(code, []).append({"effectiveDate": ed, "mid": float(mid)})
+        for rates in out.values():
+            rates.sort(key=lambda x: x["effectiveDate"])
+        return out
+
+    def _run_many(self, fn, items: list[tuple]) -> dict:
+        # Run fn(*item) for every item concurrently under one deadline.
+        # All failures are collected and reported together in a single NbpError.
+        if not items:
+            return {}
+        deadline_at = time.monotonic() + self.deadline
+        if len(items) == 1 or self.concurrency == 1:
+            return {it: fn(*it, deadline_at=deadline_at) for it in items}
+        pool = self._pool
+        if pool is None:
+            # one pool per client, also when several report jobs fetch at the same time
+            with self._lock:
+                if self._pool is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="nbp")
+                pool = self._pool
+        futures = {it: pool.submit(fn, *it, deadline_at=deadline_at) for it in items}
+        out, errors = {}, []
+        for it, fut in futures.items():
+            try:
+                out[it] = fut.result()
+            except NbpError as e:
+                errors.append(str(e))
+        if errors:
+            raise NbpError(f"{len(errors)} of {len(items)} NBP requests failed: " + "; ".join(errors))
+        return out
+
+    def fetch_many(self, requests: list[tuple[str, str, str]]) -> dict[tuple[str, str, str], list[dict]]:
+        # (currency, start, end) -> RAW NBP list, fetched concurrently
+        return self._run_many(self.fetch_rates, requests)
+
+    def fetch_tables_many(self, windows: list[tuple[str, str]]) -> dict[tuple[str, str], dict[str, list[dict]]]:
+        # (start, end) -> {currency: RAW NBP list}, fetched concurrently
+        return self._run_many(self.fetch_table, windows)
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
 
-    if cur == "PLN":
-        return [{"effectiveDate": start, "mid": 1.0}]
 
-    cp = _cache_path(cur, start, end)
-    if cp.exists():
+_client: NbpClient | None = None
+
+
+def get_client() -> NbpClient:
+    global _client
+    if _client is None:
+        _client = NbpClient()
+    return _client
+
+
+def configure(**kwargs) -> NbpClient:
+    # Replace the default client, e.g. configure(concurrency=8, base_url="http://127.0.0.1:8080/api")
+    global _client
+    if _client is not None:
+        _client.close()
+    _client = NbpClient(**kwargs)
+    return _client
+
+
+_stores: dict[Path, RateStore] = {}
+
+
+def get_store() -> RateStore:
+    # One store per cache directory (tests swap CACHE_DIR)
+    path = CACHE_DIR / "rates.sqlite3"
+    store = _stores.get(path)
+    if store is None:
+        from modules.rate_store import RateStore
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fresh = not path.exists()
+        store = _stores[path] = RateStore(path)
+        if fresh:
+            _import_legacy_cache(store)
+    return store
+
+
+def _import_legacy_cache(store: RateStore):
+    # Older versions kept one '{CUR}_{start}_{end}.json' file per fetched range
+    for cp in sorted(CACHE_DIR.glob("*_*_*.json")):
         try:
+            cur, start, end = cp.stem.split("_")
             cached = json.loads(cp.read_text(encoding="utf-8"))
-            if isinstance(cached, list) and cached:
-                # 🔥 НОРМАЛИЗАЦИЯ ФОРМАТА
-                normalized = []
-                for r in cached:
-                    if "effectiveDate" in r and "mid" in r:
-                        normalized.append(r)
-                    elif "date" in r and "rate" in r:
-                        normalized.append({"effectiveDate": r["date"], "mid": r["rate"]})
-                if normalized:
-                    return normalized
         except Exception:
-            pass
-
-    url = f"https://api.nbp.pl/api/exchangerates/rates/a/{cur}/{start}/{end}?format=json"
-    payload = _http_get_json(url)
-
-    rates = []
-    if isinstance(payload, dict):
-        for r in payload.get("rates", []):
-            ed = r.get("effectiveDate")
-            mid = r.get("mid")
-            if ed and mid is not None:
-                rates.append({"effectiveDate": ed, "mid": float(mid)})
-
-    rates.sort(key=lambda x: x["effectiveDate"])
-
-    try:
-        cp.write_text(json.dumps(rates, ensure_ascii=False, indent=2), encoding="utf-8")
-    except Exception:
-        pass
-
-    return rates
-
-
-# def fetch_nbp_rates_range(currency: str, start: str, end: str) -> list[dict]:
-#     """
-#     Return list of dicts in RAW NBP format:
-#       [{"effectiveDate": "YYYY-MM-DD", "mid": float}, ...]
-#     Sorted by date ascending. Results cached to disk.
-
-#     NOTE: If currency == "PLN", return a single-entry list with mid=1.0 for start date.
-#     """
-#     cur = currency.upper()
-
-#     if cur == "PLN":
-#         return [{"effectiveDate": start, "mid": 1.0}]
-
-#     cp = _cache_path(cur, start, end)
-#     if cp.exists():
-#         try:
-#             data = json.loads(cp.read_text(encoding="utf-8"))
-#             if isinstance(data, list):
-#                 # ожидаем уже нормализованный формат [{"effectiveDate","mid"}, ...]
-#                 return data
-#         except Exception:
-#             pass
-
-#     url = f"https://api.nbp.pl/api/exchangerates/rates/a/{cur}/{start}/{end}?format=json"
-#     payload = _http_get_json(url)
-
-#     rates: list[dict] = []
-#     if isinstance(payload, dict):
-#         for r in payload.get("rates", []):
-#             ed = r.get("effectiveDate")
-#             mid = r.get("mid")
-#             if ed and mid is not None:
-#                 try:
-#                     rates.append({"effectiveDate": ed, "mid": float(mid)})
-#                 except Exception:
-#                     continue
-
-#     # сортировка и запись в кэш
-#     rates.sort(key=lambda x: x["effectiveDate"])
-#     try:
-#         cp.write_text(json.dumps(rates, ensure_ascii=False, indent=2), encoding="utf-8")
-#     except Exception:
-#         pass
-
-#     return rates
+            continue
+        rates = []
+        for r in cached if isinstance(cached, list) else []:
+            if "effectiveDate" in r and "mid" in r:
+                rates.append(r)
+            elif "date" in r and "rate" in r:
+                rates.append({"effectiveDate": r["date"], "mid": r["rate"]})
+        # empty lists were written on network errors, they prove nothing
+        if rates:
+            store.put(cur, start, end, rates)
+
+
+def _fill_from_tables(store: RateStore, client: NbpClient, requests: list[tuple[str, str, str]]):
+    # Bulk mode: one table request per window covers every table A currency at once.
+    # Currencies missing from table A stay uncovered and fall back to per-currency requests.
+    wanted = {cur.upper() for cur, _, _ in requests} - {"PLN"}
+    spans = [
+        gap
+        for cur, start, end in requests if cur.upper() in wanted
+        for gap in store.missing(cur, start, end)
+    ]
+    _fetch_tables(store, client, spans, wanted)
+
+
+def _fetch_tables(store: RateStore, client: NbpClient, spans: list[tuple[date, date]], wanted: set[str]):
+    # Fetch whole A tables for the union of spans and store every currency they contain
+    merged = []
+    for lo, hi in sorted(spans):
+        if merged and lo <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+        else:
+            merged.append((lo, hi))
+    windows = [(s.isoformat(), e.isoformat()) for lo, hi in merged for s, e in split_range(lo, hi)]
+    for (start, end), tables in client.fetch_tables_many(windows).items():
+        # no tables at all in a window means no publication days: covered for everyone asked
+        for cur in set(tables) | (wanted if not tables else set()):
+            store.put(cur, start, end, tables.get(cur, []))
+
+
+def fetch_nbp_rates_many(requests: list[tuple[str, str, str]]) -> dict[tuple[str, str, str], list[dict]]:
+    # Answered from the local rate store; only never-fetched gaps go to the API. Gaps are cut
+    # into API-legal windows (any range length works) and fetched concurrently; the store
+    # stitches and dedupes them. Failures raise NbpError and leave the gaps uncovered.
+    # In offline mode any gap fails fast with NbpOfflineError listing what is missing.
+    store = get_store()
+    client = get_client()
+    if metrics.active() is not None:
+        ranges = [(cur, start, end) for cur, start, end in requests if cur.upper() != "PLN"]
+        missing = sum(1 for r in ranges if store.missing(*r))
+        metrics.count("fx.store.covered", len(ranges) - missing)
+        metrics.count("fx.store.missing", missing)
+    if client.bulk and not client.offline:
+        _fill_from_tables(store, client, requests)
+    gaps = []
+    for cur, start, end in requests:
+        if cur.upper() != "PLN":
+            for gap_start, gap_end in store.missing(cur, start, end):
+                gaps += [(cur.upper(), s.isoformat(), e.isoformat()) for s, e in split_range(gap_start, gap_end)]
+    if gaps and client.offline:
+        missing = ", ".join(f"{c} {s}..{e}" for c, s, e in sorted(set(gaps)))
+        raise NbpOfflineError(f"Offline mode: rates not in cache for {missing} (run prefetch-rates or import a snapshot)")
+    if gaps:
+        metrics.count("fx.store.gaps", len(set(gaps)))
+        fetched = client.fetch_many(sorted(set(gaps)))
+        for (cur, start, end), rates in fetched.items():
+            store.put(cur, start, end, rates)
+    out = {}
+    for cur, start, end in requests:
+        if cur.upper() == "PLN":
+            out[(cur, start, end)] = [{"effectiveDate": start, "mid": 1.0}]
+        else:
+            out[(cur, start, end)] = store.rates(cur, start, end)
+    return out
+
+
+def fetch_nbp_rates_range(currency: str, start: str, end: str) -> list[dict]:
+    return fetch_nbp_rates_many([(currency, start, end)])[(currency, start, end)]
+
+
+def prefetch_rates(start: str, end: str, currencies: list[str] | None = None) -> dict[str, int]:
+    # Fill the local store ahead of time; without currencies every table A currency is fetched.
+    # Ranges the store already covers are not fetched again.
+    # Returns {currency: number of rates stored for start..end}
+    store = get_store()
+    client = get_client()
+    if currencies:
+        fetch_nbp_rates_many([(c.upper(), start, end) for c in currencies])
+    else:
+        # only days not yet covered for every currency already in the store (all of them
+        # when the store is empty) are fetched
+        known = set(store.currencies())
+        spans = [gap for cur in known for gap in store.missing(cur, start, end)] if known else \
+            [(date.fromisoformat(start), date.fromisoformat(end))]
+        if spans and client.offline:
+            raise NbpOfflineError("Offline mode: cannot prefetch rates")
+        _fetch_tables(store, client, spans, known)
+        currencies = store.currencies()
+    return {c.upper(): len(store.rates(c, start, end)) for c in currencies}
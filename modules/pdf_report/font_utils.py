@@ -1,46 +1,53 @@
 # Регистрация шрифта DejaVuSans и подготовка стилей с этим шрифтом.
+# Шрифт и таблицы стилей создаются один раз на процесс и переиспользуются всеми сборками PDF.
+import copy
+import threading
 from pathlib import Path
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, StyleSheet1
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
 
 DEFAULT_FONT = "DejaVuSans"
 
+_lock = threading.Lock()
+_styles: dict = {}
+
 
 def register_fonts(font_path: str = "fonts/DejaVuSans.ttf", font_name: str = DEFAULT_FONT) -> str:
     """
-    Регистрирует TTF шрифт и возвращает имя шрифта.
+    Регистрирует TTF шрифт (один раз на процесс) и возвращает имя шрифта.
     Если файл не найден — не падаем, просто оставляем шрифт по умолчанию ReportLab.
     """
+    if font_name in pdfmetrics.getRegisteredFontNames():
+        return font_name
     p = Path(font_path)
     if p.exists():
-        try:
-            if not pdfmetrics.getFont(font_name):
-                # Если уже зарегистрирован, getFont не бросит, но на всякий регистрируем.
-                pass
-        except Exception:
-            pdfmetrics.registerFont(TTFont(font_name, str(p)))
+        with _lock:
+            if font_name not in pdfmetrics.getRegisteredFontNames():
+                pdfmetrics.registerFont(TTFont(font_name, str(p)))
     return font_name
 
 
-def make_styles(font_name: str = DEFAULT_FONT):
+def make_styles(font_name: str | None = DEFAULT_FONT):
     """
-    Возвращает набор стилей, где всем основным стилям проставлен выбранный шрифт.
+    Возвращает новый (изменяемый) набор стилей, где всем основным стилям проставлен
+    выбранный шрифт. font_name=None — стандартные стили ReportLab плюс центрированные варианты.
     """
     styles = getSampleStyleSheet()
 
-    # Базовые
-    for key in ("Normal", "BodyText", "Title", "Heading1", "Heading2", "Heading3", "Heading4"):
-        if key in styles:
-            styles[key].fontName = font_name
+    if font_name:
+        # Базовые
+        for key in ("Normal", "BodyText", "Title", "Heading1", "Heading2", "Heading3", "Heading4"):
+            if key in styles:
+                styles[key].fontName = font_name
 
-    # Немного более жирный заголовок без обращения к Bold-версии (если её нет)
-    # Можно варьировать размером:
-    styles["Title"].fontSize = 24
-    styles["Heading2"].fontSize = 16
-    styles["Heading3"].fontSize = 14
-    styles["Heading4"].fontSize = 12
+        # Немного более жирный заголовок без обращения к Bold-версии (если её нет)
+        # Можно варьировать размером:
+        styles["Title"].fontSize = 24
+        styles["Heading2"].fontSize = 16
+        styles["Heading3"].fontSize = 14
+        styles["Heading4"].fontSize = 12
 
     # Центровка заголовков — удобно иметь отдельные варианты
     styles.add(ParagraphStyle(name="TitleCenter", parent=styles["Title"], alignment=1))
@@ -50,3 +57,31 @@ def make_styles(font_name: str = DEFAULT_FONT):
 
     return styles
 
+
+def _master(font_name: str | None):
+    # Набор стилей make_styles(font_name), создаётся один раз на процесс; наружу не отдаётся
+    styles = _styles.get(font_name)
+    if styles is None:
+        with _lock:
+            styles = _styles.get(font_name)
+            if styles is None:
+                styles = _styles[font_name] = make_styles(font_name)
+    return styles
+
+
+def get_styles(font_name: str | None = DEFAULT_FONT) -> StyleSheet1:
+    """
+    Копия общего набора стилей (см. make_styles): сам набор строится один раз на имя шрифта,
+    каждый вызов получает свои неглубокие копии стилей, так что изменения не переходят
+    в следующие документы.
+    """
+    master = _master(font_name)
+    sheet = StyleSheet1()
+    for style in master.byName.values():
+        sheet.add(copy.copy(style))
+    for style in sheet.byName.values():
+        if style.parent is not None:
+            style.parent = sheet.byName.get(style.parent.name, style.parent)
+    for alias, style in master.byAlias.items():
+        sheet.byAlias[alias] = sheet.byName[style.name]
+    return sheet
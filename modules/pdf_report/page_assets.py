@@ -1,75 +1,158 @@
 # modules/pdf_report/page_assets.py
 
-from reportlab.platypus import LongTable, Paragraph, Spacer
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Flowable, LongTable, PageBreak, Paragraph, Spacer
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER
-from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.units import cm
 
-from modules.money_utils import money
+from modules.money_utils import format_minor
+from modules.pdf_report.font_utils import get_styles
+from modules.pdf_report.year_stats import YearStats
 
-styles = getSampleStyleSheet()
+HEADER = ["Ticker", "Currency", "Dividends (PLN)", "Taxes (PLN)", "Net (PLN)"]
 
+# Above this many tickers the table is pre-chunked into fixed pages drawn on the canvas (fast path)
+FAST_PATH_ROWS = 300
+ROW_HEIGHT = 18
+FONT_SIZE = 10
+CELL_PAD = 6
+COL_WIDTHS = [4.1 * cm, 2.4 * cm, 3.6 * cm, 3.6 * cm, 3.6 * cm]
+# Frame height of the yearly report: A4 with 1.6 cm margins, minus the frame padding
+DEFAULT_FRAME_HEIGHT = A4[1] - 2 * 1.6 * cm - 12
 
-def make_assets_page(year_block):
+_TABLE_STYLE = [
+    ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
+    ("GRID", (0,0), (-1,-1), 0.5, colors.black),
+    ("ALIGN", (2,1), (-1,-1), "RIGHT"),
+    ("FONTNAME", (0,0), (-1,0), "Helvetica-Bold"),
+    ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
+]
+
+
+def make_assets_page(stats, styles=None, fast=None, frame_height=DEFAULT_FRAME_HEIGHT):
     """
     Build the 'Assets summary' table with automatic page breaking.
     Sorted by ticker alphabetically.
+    `stats` is a YearStats (a JSON year block is aggregated on the fly).
+    `fast` forces the pre-chunked layout on or off; by default it is used above
+    FAST_PATH_ROWS tickers.
     """
 
-    title_style = styles["Heading2"]
-    title_style.alignment = TA_CENTER
-
-    data = [["Ticker", "Currency", "Dividends (PLN)", "Taxes (PLN)", "Net (PLN)"]]
-
-    # Build tax lookup by ticker
-    tax_map = {}
-    for t in year_block.get("taxes", []):
-        ticker = t.get("ticker")
-        if ticker:
-            tax_map[ticker] = sum(money(x.get("amountPln", 0)) for x in t.get("tax", []))
-
-    # Sort tickers alphabetically (requested behavior)
-    for asset in sorted(year_block.get("dividends", []), key=lambda x: x.get("ticker", "")):
+    if not isinstance(stats, YearStats):
+        stats = YearStats.from_year_block(stats)
 
-        ticker = asset.get("ticker", "UNKNOWN")
-        div_records = asset.get("dividend", [])
+    if styles is None:
+        styles = get_styles(None)
+    title_style = styles["H2Center"] if "H2Center" in styles else ParagraphStyle(
+        "H2Center", parent=styles["Heading2"], alignment=TA_CENTER
+    )
 
-        # Currency detection
-        currency = ""
-        if div_records:
-            currency = (div_records[0].get("currency") or "").upper()
+    data = [HEADER]
 
-        # Dividends sum
-        div_sum = sum(money(x.get("amountPln", 0)) for x in div_records)
-
-        # Tax sum
-        tax_sum = money(tax_map.get(ticker, 0))
+    # Sorted by ticker alphabetically (requested behavior); sums in grosze
+    for ticker, div_sum in stats.div_by_ticker.items():
+        tax_sum = stats.tax_by_ticker.get(ticker, 0)
 
         # Net = dividends + tax (tax is negative)
-        net = money(div_sum + tax_sum)
+        net = div_sum + tax_sum
 
         data.append([
             ticker,
-            currency,
-            f"{div_sum:.2f}",
-            f"{tax_sum:.2f}",
-            f"{net:.2f}",
+            stats.ticker_currency.get(ticker, ""),
+            format_minor(div_sum),
+            format_minor(tax_sum),
+            format_minor(net),
         ])
 
-    table = LongTable(data, repeatRows=1)
-    table.setStyle([
-        ("BACKGROUND", (0,0), (-1,0), colors.lightgrey),
-        ("GRID", (0,0), (-1,-1), 0.5, colors.black),
-        ("ALIGN", (2,1), (-1,-1), "RIGHT"),
-        ("FONTNAME", (0,0), (-1,0), "Helvetica-Bold"),
-        ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
-    ])
-
-    return [
+    title = [
         Spacer(0, 0.8 * cm),
         Paragraph("Assets Summary", title_style),
         Spacer(0, 0.3 * cm),
+    ]
+
+    if fast is None:
+        fast = len(data) - 1 > FAST_PATH_ROWS
+    if fast:
+        return title + _page_tables(data, title, frame_height)
+
+    table = LongTable(data, repeatRows=1)
+    table.setStyle(_TABLE_STYLE)
+
+    return title + [
         table,
         Spacer(0, 1.0 * cm),
     ]
+
+
+class AssetRows(Flowable):
+    """
+    One page worth of the assets table drawn straight onto the canvas: a single text object
+    for all cells and one grid call, with fixed column widths and row heights. Much cheaper
+    than a Table, which draws every cell separately.
+    """
+
+    def __init__(self, header: list, rows: list):
+        super().__init__()
+        self.header = header
+        self.rows = rows
+        self.width = sum(COL_WIDTHS)
+        self.height = (len(rows) + 1) * ROW_HEIGHT
+        self.hAlign = "CENTER"
+
+    def wrap(self, avail_width, avail_height):
+        return self.width, self.height
+
+    def draw(self):
+        c = self.canv
+        xs = [0]
+        for w in COL_WIDTHS:
+            xs.append(xs[-1] + w)
+        top = self.height
+        c.saveState()
+        c.setFillColor(colors.lightgrey)
+        c.rect(0, top - ROW_HEIGHT, self.width, ROW_HEIGHT, stroke=0, fill=1)
+        c.setFillColor(colors.black)
+        c.setLineWidth(0.5)
+        c.grid(xs, [top - i * ROW_HEIGHT for i in range(len(self.rows) + 2)])
+
+        base = (ROW_HEIGHT - FONT_SIZE) / 2 + 0.2 * FONT_SIZE
+        t = c.beginText()
+        t.setFont("Helvetica-Bold", FONT_SIZE)
+        for x, cell in zip(xs, self.header):
+            t.setTextOrigin(x + CELL_PAD, top - ROW_HEIGHT + base)
+            t.textOut(cell)
+        t.setFont("Helvetica", FONT_SIZE)
+        for i, row in enumerate(self.rows, 2):
+            y = top - i * ROW_HEIGHT + base
+            for j, cell in enumerate(row):
+                if j < 2:
+                    t.setTextOrigin(xs[j] + CELL_PAD, y)
+                else:  # amounts are right-aligned
+                    t.setTextOrigin(xs[j + 1] - CELL_PAD - stringWidth(cell, "Helvetica", FONT_SIZE), y)
+                t.textOut(cell)
+        c.drawText(t)
+        c.restoreState()
+
+
+def _page_tables(data: list, title: list, frame_height: float) -> list:
+    """
+    High-volume layout: rows are cut into blocks that each fit one page, so ReportLab
+    neither measures cells nor splits tables.
+    """
+    used = sum(f.wrap(sum(COL_WIDTHS), frame_height)[1] + f.getSpaceAfter() for f in title)
+    # one row of slack for rounding; every block repeats the header
+    first = max(1, int((frame_height - used) // ROW_HEIGHT) - 2)
+    per_page = int(frame_height // ROW_HEIGHT) - 2
+
+    header, rows = data[0], data[1:]
+    out = []
+    start, size = 0, first
+    while start < len(rows) or not out:
+        if out:
+            out.append(PageBreak())
+        out.append(AssetRows(header, rows[start:start + size]))
+        start, size = start + size, per_page
+    return out
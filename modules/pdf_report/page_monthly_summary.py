@@ -2,29 +2,19 @@ from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
 from reportlab.lib import colors
 from reportlab.lib.units import cm
 
+from modules.money_utils import format_minor
+from modules.pdf_report.year_stats import YearStats
 
-def make_monthly_summary_page(ctx, styles):
-    year_block = ctx.get("years", [])[0]
 
-    from collections import defaultdict
-    div_m = defaultdict(float)
-    tax_m = defaultdict(float)
+def make_monthly_summary_page(stats, styles):
+    # stats: YearStats, or the legacy {"years": [year_block]} context
+    if not isinstance(stats, YearStats):
+        stats = YearStats.from_year_block(stats.get("years", [])[0])
+    div_m, tax_m = stats.div_by_month, stats.tax_by_month
 
-    def month_key(d):
-        return d[:7] if d else "unknown"
-
-    for a in year_block.get("dividends", []) or []:
-        for r in a.get("dividend", []) or []:
-            div_m[month_key(r.get("date"))] += float(r.get("amountPln", 0) or 0)
-
-    for a in year_block.get("taxes", []) or []:
-        for r in a.get("tax", []) or []:
-            tax_m[month_key(r.get("date"))] += float(r.get("amountPln", 0) or 0)
-
-    months = sorted(set(div_m) | set(tax_m))
     rows = [["Month", "Dividends (PLN)", "Tax (PLN)"]]
-    for m in months:
-        rows.append([m, f"{div_m[m]:.2f}", f"{tax_m[m]:.2f}"])
+    for m in stats.months:
+        rows.append([m, format_minor(div_m.get(m, 0)), format_minor(tax_m.get(m, 0))])
 
     tbl = Table(rows, hAlign="CENTER", colWidths=[6.0 * cm, 5.0 * cm, 5.0 * cm])
     tbl.setStyle(TableStyle([
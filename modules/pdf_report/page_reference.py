@@ -4,24 +4,28 @@ from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER
 from reportlab.lib.units import cm
 from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.styles import ParagraphStyle
 
-styles = getSampleStyleSheet()
+from modules.pdf_report.font_utils import get_styles
 
 
-def make_reference_page(data: dict, show_period=True):
+def make_reference_page(data: dict, show_period=True, styles=None):
     """
     Builds per-currency FX tables.
     One currency = one table.
     """
 
+    if styles is None:
+        styles = get_styles(None)
+
     year_block = data["years"][0]
     fx = year_block.get("fx", {})
 
     elements = []
 
-    title_style = styles["Heading2"]
-    title_style.alignment = TA_CENTER
+    title_style = styles["H2Center"] if "H2Center" in styles else ParagraphStyle(
+        "H2Center", parent=styles["Heading2"], alignment=TA_CENTER
+    )
 
     if show_period:
         elements.append(Paragraph(f"Report period: {year_block['fromDate']} - {year_block['toDate']}", title_style))
@@ -0,0 +1,112 @@
+# modules/pdf_report/year_stats.py
+
+from datetime import date
+
+from modules.money_utils import percent_minor
+from modules.row_store import DIVIDEND, RowStore
+
+
+class YearStats:
+    """
+    Everything the PDF pages show about one year, computed in a single pass over the rows.
+    All amounts are PLN grosze (ints).
+    """
+
+    __slots__ = (
+        "year", "from_date", "to_date",
+        "total_div_pln", "total_tax_pln", "div_count", "tax_count",
+        "tickers", "per_ccy_pln", "div_by_ticker", "tax_by_ticker", "ticker_currency",
+        "div_by_month", "tax_by_month",
+    )
+
+    @classmethod
+    def from_year_block(cls, year_block: dict) -> "YearStats":
+        return cls.from_store(RowStore.from_year_block(year_block), str(year_block.get("year", "")))
+
+    @classmethod
+    def from_store(cls, store: RowStore, year: str) -> "YearStats":
+        tickers, currencies = store.tickers, store.currencies
+        totals = [0, 0]
+        counts = [0, 0]
+        by_ticker = ([0] * len(tickers), [0] * len(tickers))
+        seen_ticker = ([False] * len(tickers), [False] * len(tickers))
+        by_ccy = [0] * len(currencies)
+        first_ccy = [None] * len(tickers)
+        by_day = ({}, {})
+        lo = hi = None
+
+        for k, d, t, c, p in zip(store.kind, store.day, store.ticker, store.currency, store.pln):
+            totals[k] += p
+            counts[k] += 1
+            by_ticker[k][t] += p
+            seen_ticker[k][t] = True
+            by_ccy[c] += p
+            if k == DIVIDEND and first_ccy[t] is None:
+                first_ccy[t] = currencies[c]
+            by_day[k][d] = by_day[k].get(d, 0) + p
+            if lo is None or d < lo:
+                lo = d
+            if hi is None or d > hi:
+                hi = d
+
+        stats = cls()
+        stats.year = year
+        if lo is not None:
+            stats.from_date = date.fromordinal(lo).isoformat()
+            stats.to_date = date.fromordinal(hi).isoformat()
+        elif year.isdigit() and len(year) == 4:
+            stats.from_date, stats.to_date = f"{year}-01-01", f"{year}-12-31"
+        else:
+            stats.from_date = stats.to_date = None
+        stats.total_div_pln, stats.total_tax_pln = totals
+        stats.div_count, stats.tax_count = counts
+        stats.tickers = list(tickers)
+
+        per_ccy = {}
+        for i, v in enumerate(by_ccy):
+            if currencies[i]:
+                ccy = currencies[i].upper()
+                per_ccy[ccy] = per_ccy.get(ccy, 0) + v
+        stats.per_ccy_pln = dict(sorted(per_ccy.items()))
+
+        order = sorted(range(len(tickers)), key=tickers.__getitem__)
+        stats.div_by_ticker = {tickers[i]: by_ticker[0][i] for i in order if seen_ticker[0][i]}
+        stats.tax_by_ticker = {tickers[i]: by_ticker[1][i] for i in order if seen_ticker[1][i]}
+        stats.ticker_currency = {tickers[i]: first_ccy[i].upper() for i in order if first_ccy[i] is not None}
+
+        stats.div_by_month, stats.tax_by_month = (_by_month(m) for m in by_day)
+        return stats
+
+    @property
+    def tickers_count(self) -> int:
+        return len([t for t in self.tickers if t and t != "UNKNOWN"])
+
+    @property
+    def add_pl_tax(self) -> int:
+        """Additional Polish tax on dividends: 19% minus the 10% withheld at source, i.e. 9%."""
+        return percent_minor(self.total_div_pln, 9)
+
+    @property
+    def final_net(self) -> int:
+        return self.total_div_pln + self.total_tax_pln - self.add_pl_tax
+
+    @property
+    def pit38_tax(self) -> int:
+        """Tax due in Poland on the dividend income (19%)."""
+        return percent_minor(self.total_div_pln, 19)
+
+    @property
+    def pit38_due(self) -> int:
+        return self.pit38_tax - abs(self.total_tax_pln)
+
+    @property
+    def months(self) -> list[str]:
+        return sorted(set(self.div_by_month) | set(self.tax_by_month))
+
+
+def _by_month(by_day: dict[int, int]) -> dict[str, int]:
+    out: dict[str, int] = {}
+    for d, v in by_day.items():
+        m = date.fromordinal(d).isoformat()[:7]
+        out[m] = out.get(m, 0) + v
+    return dict(sorted(out.items()))
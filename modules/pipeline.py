@@ -0,0 +1,300 @@
+# modules/pipeline.py
+# Statements folder -> {"years": [...]} report -> JSON and PDF files, shared by the CLI
+# (main.py), batch runs (modules/batch.py) and the report service (modules/report_service.py).
+#
+# Stages: parse (statement_parser, optionally through the ScanCache and a process pool),
+# FX plan and fetch (one FxPlan for every statement), convert (ReportBuilder rows in
+# grosze) and write (JSON on a background thread while the PDFs are rendered).
+
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+from pathlib import Path
+
+from modules import metrics
+from modules.fx_planner import FxPlan, rate_window, rates_used
+from modules.fx_rates import FxRates
+from modules.logger_module import get_logger
+from modules.money_utils import convert_many
+from modules.nbp import fetch_nbp_rates_many
+from modules.report_builder import ReportBuilder
+from modules.row_store import RowStore
+from modules.scan_cache import ScanCache
+from modules.statement_parser import StatementScan, scan_rows, scan_statement
+
+logger = get_logger("pipeline")
+
+
+class _AllYears:
+    def __contains__(self, year: str) -> bool:
+        return True
+
+
+ALL_YEARS = _AllYears()
+
+
+def _add_year(report: ReportBuilder, fx: FxRates, nbp_rates: dict, year: str, period: tuple, currencies: dict, rows: list):
+    report.year_block(year, *period)
+    merger = report.fx_merger(year)
+
+    # record the rates these rows use in the year's fx block
+    for c, (lo, hi) in sorted(currencies.items()):
+        start, end = (d.isoformat() for d in rate_window(lo, hi))
+        if c == "PLN":
+            merger.add(c, [{"effectiveDate": start, "mid": 1.0}])
+        else:
+            merger.add(c, rates_used(nbp_rates.get(c, []), start, end))
+
+    # convert the whole batch in one pass of integer multiplications
+    pln = convert_many([r.amount for r in rows], [fx.units_for(r.currency, r.date) for r in rows])
+    report.add_rows(year, rows, pln)
+
+
+def apply_scan(scan: StatementScan, report: ReportBuilder, fx: FxRates, nbp_rates: dict, years=None):
+    # years=None: one block for the statement's period year. Otherwise rows are bucketed by
+    # their own year and every year in `years` (a collection, or ALL_YEARS) gets its block.
+    info = scan.period
+    rows = scan.dividends + scan.taxes
+    if years is None:
+        rows = [r for r in rows if r.date.startswith(info.year)]
+        _add_year(report, fx, nbp_rates, info.year, (info.from_date, info.to_date), scan.currencies, rows)
+        return
+
+    buckets = {info.year: []} if info.year in years else {}
+    for r in rows:
+        if r.date[:4] in years:
+            buckets.setdefault(r.date[:4], []).append(r)
+    for year, yrows in sorted(buckets.items()):
+        # the statement period clipped to the year
+        period = (max(info.from_date, f"{year}-01-01"), min(info.to_date, f"{year}-12-31"))
+        currencies = {}
+        for r in yrows:
+            rng = currencies.setdefault(r.currency.upper(), [r.date, r.date])
+            rng[0], rng[1] = min(rng[0], r.date), max(rng[1], r.date)
+        _add_year(report, fx, nbp_rates, year, period, currencies, yrows)
+
+
+class FxCache:
+    # Fetched plans -> (raw NBP rates, FxRates) kept between runs of one process (the report
+    # service), so a repeated request skips the rate store and the RateTable build. Only
+    # plans that end before today are kept: rates of past days do not change.
+
+    def __init__(self, size: int = 32):
+        self.size = size
+        self._entries: OrderedDict[tuple, tuple[dict, FxRates]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> tuple[dict, FxRates] | None:
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+            return hit
+
+    def put(self, key: tuple, value: tuple[dict, FxRates]):
+        today = date.today().isoformat()
+        if any(end >= today for _, _, end in key):
+            return
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+def fetch_rates(scans: list[StatementScan], fx_cache: FxCache | None = None) -> tuple[dict, FxRates]:
+    # One FX plan and fetch for all scans: (raw NBP rates by currency, FxRates)
+    with metrics.span("fx.plan"):
+        plan = FxPlan.from_scans(scans)
+        key = tuple(plan.requests())
+    if fx_cache is not None and (hit := fx_cache.get(key)) is not None:
+        metrics.count("fx.cache.hits")
+        return hit
+    with metrics.span("fx.fetch"):
+        nbp_rates = plan.fetch(fetch_nbp_rates_many)
+        fx = FxRates.from_nbp(nbp_rates)
+    if fx_cache is not None:
+        fx_cache.put(key, (nbp_rates, fx))
+    return nbp_rates, fx
+
+
+def _process_scans(scans, report: ReportBuilder, years=None, fx_cache: FxCache | None = None, reload=None):
+    # 1) keep the period and FX ranges of statements with a period, 2) plan and fetch FX for
+    # all of them, 3) convert in order. With reload(paths) -> scans, the rows are dropped
+    # after step 1 and read again one statement at a time in step 3, so at most one scan
+    # holds its rows at any time.
+    valid = []
+    with metrics.span("parse"):
+        for scan in scans:
+            metrics.count("statements")
+            if scan.period:
+                valid.append(scan)
+                metrics.count("rows.dividends", len(scan.dividends))
+                metrics.count("rows.taxes", len(scan.taxes))
+            else:
+                logger.warning(f"Could not parse report period for: {scan.path}")
+            if reload is not None:
+                scan.release()
+    nbp_rates, fx = fetch_rates(valid, fx_cache)
+    with metrics.span("convert"):
+        loaded = iter(valid) if reload is None else reload([s.path for s in valid])
+        for _ in valid:
+            with metrics.span("reload"):
+                scan = next(loaded)
+            logger.info(f"Processing {Path(scan.path).name}")
+            apply_scan(scan, report, fx, nbp_rates, years)
+            scan.release()  # the rows now live in the report's RowStore
+
+
+def process_broker_report(file_path: str, report: ReportBuilder, target_year: str | None = None):
+    # one streaming pass: period header, typed rows and FX needs
+    _process_scans([scan_statement(file_path, target_year)], report)
+
+
+def _scan_result(future, collected: bool) -> StatementScan:
+    if not collected:
+        return future.result()
+    # the worker's spans and counters (parse.period, ...) come back with the scan
+    scan, recorded = future.result()
+    metrics.merge(recorded)
+    return scan
+
+
+def _parse_all(paths: list[str], target_year, jobs: int):
+    # Parse statements, in a process pool when jobs > 1. Results come back in input
+    # order whatever the completion order, so the merge below is deterministic; at most
+    # `jobs` parsed scans wait for the consumer.
+    if jobs <= 1 or len(paths) <= 1:
+        for p in paths:
+            yield scan_statement(p, target_year)
+        return
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    workers = min(jobs, len(paths))
+    collected = metrics.active() is not None
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for p in paths:
+            if collected:
+                pending.append(pool.submit(metrics.in_worker, scan_statement, p, target_year))
+            else:
+                pending.append(pool.submit(scan_statement, p, target_year))
+            if len(pending) > workers:
+                yield _scan_result(pending.popleft(), collected)
+        while pending:
+            yield _scan_result(pending.popleft(), collected)
+
+
+def scan_all(paths: list[str], target_year, jobs: int, cache: ScanCache | None = None):
+    # With a cache only new or changed statements are parsed; they are parsed in full so
+    # the cached partial serves any later year selection. Scans are loaded one at a time.
+    if cache is None:
+        yield from _parse_all(paths, target_year, jobs)
+        return
+    with metrics.span("cache.lookup"):
+        cached = [cache.has(p) for p in paths]
+    todo = [p for p, hit in zip(paths, cached) if not hit]
+    logger.info(f"Statements: {len(paths) - len(todo)} cached, {len(todo)} to parse")
+    metrics.count("cache.hits", len(paths) - len(todo))
+    metrics.count("cache.misses", len(todo))
+    parsed = _parse_all(todo, None, jobs)
+    for p, hit in zip(paths, cached):
+        scan = cache.get(p, target_year) if hit else None
+        if scan is None:
+            full = scan_statement(p) if hit else next(parsed)  # hit: the partial was unreadable
+            cache.put(p, full)
+            scan = scan_rows(p, full.rows(), target_year)
+            full.release()
+        yield scan
+    with metrics.span("cache.save"):
+        cache.save()
+
+
+def _reload(paths: list[str], target_year, jobs: int, cache: ScanCache | None):
+    # Statements scanned before, one at a time: from the cache (saved by scan_all) or parsed again
+    if cache is None:
+        yield from _parse_all(paths, target_year, jobs)
+        return
+    for p in paths:
+        yield cache.get(p, target_year) or scan_statement(p, target_year)
+
+
+def process_all_reports(folder: str, target_year: str | None = None, jobs: int = 1, cache: ScanCache | None = None, sinks=()) -> dict:
+    report = ReportBuilder(sinks)
+    paths = [str(p) for p in sorted(Path(folder).glob("*.csv"))]
+    _process_scans(scan_all(paths, target_year, jobs, cache), report,
+                   reload=lambda todo: _reload(todo, target_year, jobs, cache))
+    return report.build()
+
+
+def collect_years(folder: str, years=ALL_YEARS, jobs: int = 1, cache: ScanCache | None = None, sinks=(),
+                  fx_cache: FxCache | None = None) -> ReportBuilder:
+    # Every statement is parsed once and FX is planned once for all requested years;
+    # the report has one block per year that has statements or rows.
+    report = ReportBuilder(sinks)
+    paths = [str(p) for p in sorted(Path(folder).glob("*.csv"))]
+    target = None if years is ALL_YEARS else set(years)
+    _process_scans(scan_all(paths, target, jobs, cache), report, ALL_YEARS if target is None else target, fx_cache,
+                   reload=lambda todo: _reload(todo, target, jobs, cache))
+    return report
+
+
+def build_report(report: ReportBuilder) -> dict:
+    # {"years": [...]} sorted by year
+    with metrics.span("aggregate"):
+        data = report.build()
+    data["years"].sort(key=lambda yb: yb["year"])
+    return data
+
+
+def process_years(folder: str, years=ALL_YEARS, jobs: int = 1, cache: ScanCache | None = None, sinks=(),
+                  fx_cache: FxCache | None = None) -> dict:
+    return build_report(collect_years(folder, years, jobs, cache, sinks, fx_cache))
+
+
+def parse_years(spec: str) -> list[str]:
+    # '2019-2025', '2019,2021' or '2024' -> ['2019', ...]
+    out = []
+    for part in spec.split(","):
+        lo, _, hi = part.strip().partition("-")
+        if not (lo.isdigit() and len(lo) == 4 and (not hi or (hi.isdigit() and len(hi) == 4 and hi >= lo))):
+            raise ValueError(f"Invalid year range: {part.strip()!r}")
+        out += [str(y) for y in range(int(lo), int(hi or lo) + 1)]
+    return sorted(set(out))
+
+
+def save_json(report_data: dict, out_dir: str, year: str) -> str:
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    path = Path(out_dir) / f"divs_{year}.json"
+    # json.dump streams the encoder's chunks instead of building the whole string
+    with metrics.span("json.write"), open(path, "w", encoding="utf-8") as fh:
+        json.dump(report_data, fh, ensure_ascii=False, indent=2)
+        metrics.count("json.bytes", fh.tell())
+    logger.info(f"Saved JSON: {path}")
+    return str(path)
+
+
+def year_stores(report: ReportBuilder, data: dict) -> dict[str, RowStore]:
+    # The RowStore behind every year block of data (report.build() of the same report)
+    return {yb["year"]: report.rows(yb["year"]) for yb in data["years"]}
+
+
+def write_outputs(data: dict, stores: dict[str, RowStore], pdf_name: str, json_only: bool,
+                  out_dir: str = "tax_reports") -> list[str]:
+    # One JSON and one PDF per year block. PDFs are rendered from the year's RowStore
+    # (see year_stores) while a background thread writes the JSON files. Returns the files written.
+    if json_only:
+        return [save_json({"years": [yb]}, out_dir, yb["year"]) for yb in data["years"]]
+    from concurrent.futures import ThreadPoolExecutor
+    from modules.pdf_report.annual_builder import build_yearly_pdf
+    from modules.pdf_report.year_stats import YearStats
+    pdfs = []
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="json") as pool:
+        pending = [pool.submit(save_json, {"years": [yb]}, out_dir, yb["year"]) for yb in data["years"]]
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+        for yb in data["years"]:
+            pdf = str(Path(out_dir) / pdf_name.format(year=yb["year"]))
+            with metrics.span("pdf.build"):
+                if build_yearly_pdf(YearStats.from_store(stores[yb["year"]], yb["year"]), pdf):
+                    pdfs.append(pdf)
+        return [f.result() for f in pending] + pdfs
@@ -0,0 +1,152 @@
+# modules/rate_store.py
+# Persistent per-day FX rate store (SQLite) that remembers which date intervals are covered.
+#
+# Any range query is answered locally; only the gaps that were never fetched need the
+# network. A covered day without a rate is a day NBP did not publish (weekend, holiday).
+
+import json
+import sqlite3
+import threading
+from datetime import date, timedelta
+from pathlib import Path
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rates (
+    currency TEXT NOT NULL,
+    day      TEXT NOT NULL,
+    mid      REAL NOT NULL,
+    PRIMARY KEY (currency, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS coverage (
+    currency TEXT NOT NULL,
+    start    TEXT NOT NULL,
+    end      TEXT NOT NULL,
+    PRIMARY KEY (currency, start)
+) WITHOUT ROWID;
+"""
+
+
+SNAPSHOT_FORMAT = "nbp-rates-snapshot"
+
+
+def _d(s) -> date:
+    return s if isinstance(s, date) else date.fromisoformat(s)
+
+
+class RateStore:
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._coverage: dict[str, list[tuple[date, date]]] = {}
+        for cur, start, end in self._db.execute("SELECT currency, start, end FROM coverage ORDER BY currency, start"):
+            self._coverage.setdefault(cur, []).append((_d(start), _d(end)))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def coverage(self, currency: str) -> list[tuple[date, date]]:
+        with self._lock:
+            return list(self._coverage.get(currency.upper(), []))
+
+    def missing(self, currency: str, start, end) -> list[tuple[date, date]]:
+        # Sub-ranges of start..end (inclusive) that are not covered yet
+        start, end = _d(start), _d(end)
+        gaps = []
+        with self._lock:
+            coverage = self._coverage.get(currency.upper(), [])  # put() swaps in a new list
+        for lo, hi in coverage:
+            if hi < start:
+                continue
+            if lo > end:
+                break
+            if lo > start:
+                gaps.append((start, lo - timedelta(days=1)))
+            start = max(start, hi + timedelta(days=1))
+            if start > end:
+                return gaps
+        if start <= end:
+            gaps.append((start, end))
+        return gaps
+
+    def rates(self, currency: str, start, end) -> list[dict]:
+        # RAW NBP format [{'effectiveDate','mid'}, ...] sorted by date
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT day, mid FROM rates WHERE currency = ? AND day BETWEEN ? AND ? ORDER BY day",
+                (currency.upper(), _d(start).isoformat(), _d(end).isoformat()),
+            ).fetchall()
+        return [{"effectiveDate": d, "mid": m} for d, m in rows]
+
+    def put(self, currency: str, start, end, rates: list[dict], today: date | None = None):
+        # Store rates fetched for start..end and mark the range as covered. Today and later
+        # stay uncovered: today's table may not be published yet.
+        cur = currency.upper()
+        start, end = _d(start), _d(end)
+        end = min(end, (today or date.today()) - timedelta(days=1))
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO rates (currency, day, mid) VALUES (?, ?, ?)",
+                [(cur, r["effectiveDate"], float(r["mid"])) for r in rates],
+            )
+            if start > end:
+                return
+            merged = []
+            for lo, hi in self._coverage.get(cur, []):
+                if hi < start - timedelta(days=1) or lo > end + timedelta(days=1):
+                    merged.append((lo, hi))
+                else:
+                    start, end = min(start, lo), max(end, hi)
+            merged.append((start, end))
+            merged.sort()
+            self._coverage[cur] = merged
+            self._db.execute("DELETE FROM coverage WHERE currency = ?", (cur,))
+            self._db.executemany(
+                "INSERT INTO coverage (currency, start, end) VALUES (?, ?, ?)",
+                [(cur, lo.isoformat(), hi.isoformat()) for lo, hi in merged],
+            )
+
+    def currencies(self) -> list[str]:
+        with self._lock:
+            return sorted(self._coverage)
+
+    def export_snapshot(self, path, start=None, end=None, currencies=None) -> int:
+        # Write covered intervals and rates (optionally clipped to start..end) to a JSON file
+        # that another host can import for offline runs. Returns the number of rates written.
+        lo_bound = _d(start) if start else date.min
+        hi_bound = _d(end) if end else date.max
+        out, count = {}, 0
+        for cur in sorted(c.upper() for c in currencies) if currencies else self.currencies():
+            coverage = [
+                (max(lo, lo_bound), min(hi, hi_bound))
+                for lo, hi in self.coverage(cur)
+                if hi >= lo_bound and lo <= hi_bound
+            ]
+            if not coverage:
+                continue
+            rates = self.rates(cur, coverage[0][0], coverage[-1][1])
+            out[cur] = {
+                "coverage": [[lo.isoformat(), hi.isoformat()] for lo, hi in coverage],
+                "rates": [[r["effectiveDate"], r["mid"]] for r in rates],
+            }
+            count += len(rates)
+        payload = {"format": SNAPSHOT_FORMAT, "version": 1, "table": "A", "currencies": out}
+        Path(path).write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        return count
+
+    def import_snapshot(self, path) -> int:
+        # Merge a snapshot written by export_snapshot into the store; returns the number of rates
+        payload = json.loads(Path(path).read_text(encoding="utf-8"))
+        if payload.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} is not an FX rate snapshot")
+        count = 0
+        for cur, blk in payload.get("currencies", {}).items():
+            rates = [{"effectiveDate": d, "mid": m} for d, m in blk.get("rates", [])]
+            coverage = blk.get("coverage", [])
+            for i, (lo, hi) in enumerate(coverage):
+                # rates are stored once, with the first interval
+                self.put(cur, lo, hi, rates if i == 0 else [], today=date.max)
+            count += len(rates)
+        return count
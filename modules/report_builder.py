@@ -0,0 +1,64 @@
+# modules/report_builder.py
+# Indexed accumulator for the {"years": [...]} report structure.
+
+from modules.fx_rates import RateMerger
+from modules.row_store import DIVIDEND, TAX, RowStore
+from modules.statement_parser import DividendRow
+
+
+class ReportBuilder:
+    # Keeps dict indexes by year and one columnar RowStore per year, so adding a row is an
+    # append instead of the linear next(...) scans done by add_dividend_to_report/add_tax_to_report.
+    # The JSON structure with float amounts is produced once, by build().
+
+    def __init__(self, sinks=()):
+        # sinks: exports (modules/exports.py) that receive every batch of rows as it is added
+        self._sinks = list(sinks)
+        self._years: dict[str, dict] = {}
+        self._stores: dict[str, RowStore] = {}
+        self._mergers: dict[str, RateMerger] = {}
+
+    def year_block(self, year: str, from_date: str | None = None, to_date: str | None = None) -> dict:
+        # Period dates are taken from the first statement that creates the block
+        yb = self._years.get(year)
+        if yb is None:
+            yb = {"year": year}
+            if from_date and to_date:
+                yb["fromDate"] = from_date
+                yb["toDate"] = to_date
+            yb.update({"dividends": [], "taxes": [], "fx": {}})
+            self._years[year] = yb
+        return yb
+
+    def fx_merger(self, year: str) -> RateMerger:
+        merger = self._mergers.get(year)
+        if merger is None:
+            merger = self._mergers[year] = RateMerger(self.year_block(year)["fx"])
+        return merger
+
+    def rows(self, year: str) -> RowStore:
+        store = self._stores.get(year)
+        if store is None:
+            self.year_block(year)
+            store = self._stores[year] = RowStore()
+        return store
+
+    def add_rows(self, year: str, rows, pln: list[int]):
+        # Parsed DividendRow/TaxRow rows with their PLN amounts in grosze
+        self.rows(year).extend(rows, pln)
+        if self._sinks:
+            self._emit(year, [
+                (DIVIDEND if type(r) is DividendRow else TAX, r.date, r.ticker, r.currency, r.amount, p)
+                for r, p in zip(rows, pln)
+            ])
+
+    def _emit(self, year: str, batch: list):
+        for sink in self._sinks:
+            sink.write(year, batch)
+
+    def build(self) -> dict:
+        years = []
+        for year, yb in self._years.items():
+            store = self._stores.get(year)
+            years.append({**yb, **(store.to_blocks() if store else {"dividends": [], "taxes": []})})
+        return {"years": years}
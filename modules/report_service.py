@@ -0,0 +1,271 @@
+# modules/report_service.py
+# Long-running local report service (main.py serve): asyncio HTTP/1.1 on localhost.
+#
+#   GET  /health    -> {"status": "ok", "running": n, "queued": n, "workers": n, "queueSize": n}
+#   POST /reports   <- {"folder": "broker_reports"} or {"statements": {"<name>.csv": "<csv text>", ...}}
+#                      ("folder" is resolved against the service root and must stay inside it)
+#                      plus optional "years" ("2025", "2019-2025", "2021,2023"; default: all)
+#                      and "format" ("json", default, or "pdf" for a single year)
+#                   -> the {"years": [...]} report as JSON, or the yearly PDF
+#
+# One process keeps ReportLab, the font, the shared styles, the open rate store and the
+# rate tables of earlier jobs (pipeline.FxCache) warm for every request. Jobs run on
+# `workers` threads; up to `queue_size` more wait for a thread, anything beyond that gets
+# 503 with Retry-After at once (backpressure). A connection that sends nothing for
+# READ_TIMEOUT seconds is closed (408 if a request was under way). When serve() is
+# cancelled, open connections are cancelled and awaited before it returns.
+
+import asyncio
+import io
+import json
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from modules.fx_rates import MissingRateError
+from modules.nbp import NbpError
+from modules.pipeline import ALL_YEARS, FxCache, build_report, collect_years, parse_years
+from modules.report_builder import ReportBuilder
+
+logger = logging.getLogger("report_service")
+
+MAX_BODY = 64 * 2**20
+READ_TIMEOUT = 30.0
+_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed", 408: "Request Timeout",
+            413: "Payload Too Large", 500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable"}
+
+
+class RequestError(ValueError):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ReportService:
+    """
+    Reports come from pipeline.collect_years; FX errors (NbpError, MissingRateError)
+    are answered with 502. Folders outside `root` are answered with 403.
+    """
+
+    def __init__(self, workers: int = 2, queue_size: int = 16, max_body: int = MAX_BODY,
+                 read_timeout: float = READ_TIMEOUT, root: str | Path = "."):
+        self.workers = max(1, workers)
+        self.queue_size = max(0, queue_size)
+        self.max_body = max_body
+        self.read_timeout = read_timeout
+        self.root = Path(root).resolve()
+        self.fx_cache = FxCache()
+        self.running = 0
+        self.queued = 0
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="report")
+        self._slots: asyncio.Semaphore | None = None
+        self._connections: set[asyncio.Task] = set()  # handle() tasks of open connections
+        # ReportLab does not promise thread safety: documents are laid out one at a time
+        self._pdf_lock = threading.Lock()
+
+    @staticmethod
+    def warm_up():
+        # Load everything a request would otherwise pay for on its first PDF
+        from modules.nbp import get_store
+        from modules.pdf_report.annual_builder import build_yearly_pdf
+        from modules.pdf_report.year_stats import YearStats
+        from modules.row_store import RowStore
+
+        get_store()
+        build_yearly_pdf(YearStats.from_store(RowStore(), "2000"), io.BytesIO())
+
+    # --- jobs (worker threads) ---
+
+    def process(self, folder: str, years) -> ReportBuilder:
+        return collect_years(folder, years, fx_cache=self.fx_cache)
+
+    def run_job(self, request: dict) -> tuple[str, bytes]:
+        # (content type, body) for one POST /reports request
+        years_spec = request.get("years")
+        try:
+            years = parse_years(str(years_spec)) if years_spec else ALL_YEARS
+        except ValueError as e:
+            raise RequestError(400, str(e)) from None
+        fmt = request.get("format", "json")
+        if fmt not in ("json", "pdf"):
+            raise RequestError(400, f"Unknown format {fmt!r}, expected 'json' or 'pdf'")
+
+        if "statements" in request:
+            statements = request["statements"]
+            if not isinstance(statements, dict) or not statements:
+                raise RequestError(400, "'statements' must be a non-empty {name: csv text} object")
+            with tempfile.TemporaryDirectory(prefix="statements_") as tmp:
+                for name, text in statements.items():
+                    if not isinstance(text, str) or Path(name).name != name or not name.endswith(".csv"):
+                        raise RequestError(400, f"Invalid statement {name!r}: expected '<name>.csv' with CSV text")
+                    (Path(tmp) / name).write_text(text, encoding="utf-8")
+                report = self.process(tmp, years)
+        elif isinstance(request.get("folder"), str):
+            folder = (self.root / request["folder"]).resolve()
+            if not folder.is_relative_to(self.root):
+                raise RequestError(403, f"Folder {request['folder']!r} is outside the service root")
+            if not folder.is_dir():
+                raise RequestError(404, f"No such folder: {folder}")
+            report = self.process(str(folder), years)
+        else:
+            raise RequestError(400, "Expected 'folder' or 'statements'")
+
+        data = build_report(report)
+        if not data.get("years"):
+            raise RequestError(404, "No data found for given year")
+        if fmt == "json":
+            return "application/json", json.dumps(data, ensure_ascii=False).encode("utf-8")
+        if len(data["years"]) != 1:
+            raise RequestError(400, f"PDF needs exactly one year, got {len(data['years'])}; pass 'years'")
+        from modules.pdf_report.annual_builder import build_yearly_pdf
+        from modules.pdf_report.year_stats import YearStats
+
+        year = data["years"][0]["year"]
+        buf = io.BytesIO()
+        with self._pdf_lock:
+            ok = build_yearly_pdf(YearStats.from_store(report.rows(year), year), buf)
+        if not ok:
+            raise RuntimeError("PDF was not built, see the log")
+        return "application/pdf", buf.getvalue()
+
+    # --- HTTP ---
+
+    def health(self) -> dict:
+        return {"status": "ok", "running": self.running, "queued": self.queued,
+                "workers": self.workers, "queueSize": self.queue_size}
+
+    async def submit(self, request: dict) -> tuple[int, str, bytes, dict]:
+        if self.running + self.queued >= self.workers + self.queue_size:
+            return _json_response(503, {"error": "Too many report jobs, retry later"}, {"Retry-After": "1"})
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+        try:
+            ctype, body = await asyncio.get_running_loop().run_in_executor(self._pool, self.run_job, request)
+        except RequestError as e:
+            return _json_response(e.status, {"error": str(e)})
+        except (NbpError, MissingRateError) as e:
+            logger.error(f"FX rates unavailable: {e}")
+            return _json_response(502, {"error": f"FX rates unavailable: {e}"})
+        except Exception as e:
+            logger.exception("Report job failed")
+            return _json_response(500, {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            self.running -= 1
+            self._slots.release()
+        return 200, ctype, body, {}
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> tuple[int, str, bytes, dict]:
+        path = path.split("?")[0]
+        if path == "/health":
+            if method != "GET":
+                return _json_response(405, {"error": "Use GET"})
+            return _json_response(200, self.health())
+        if path == "/reports":
+            if method != "POST":
+                return _json_response(405, {"error": "Use POST"})
+            try:
+                request = json.loads(body.decode("utf-8"))
+            except ValueError as e:
+                return _json_response(400, {"error": f"Invalid JSON: {e}"})
+            if not isinstance(request, dict):
+                return _json_response(400, {"error": "Expected a JSON object"})
+            return await self.submit(request)
+        return _json_response(404, {"error": f"Unknown path {path}"})
+
+    async def _read(self, read, *args) -> bytes:
+        return await asyncio.wait_for(read(*args), self.read_timeout)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # One connection, HTTP/1.1 keep-alive until the client closes or asks to
+        started = False  # a request line was read and its response is not written yet
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                started = False
+                line = await self._read(reader.readline)
+                if not line:
+                    break
+                started = True
+                try:
+                    method, path, version = line.decode("latin-1").split()
+                except ValueError:
+                    await _write(writer, *_json_response(400, {"error": "Bad request line"}), close=True)
+                    break
+                headers = {}
+                while (h := await self._read(reader.readline)) not in (b"\r\n", b"\n", b""):
+                    name, _, value = h.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+                if length < 0 or length > self.max_body:
+                    # the body is not read: the connection cannot be reused
+                    status = 400 if length < 0 else 413
+                    await _write(writer, *_json_response(status, {"error": _REASONS[status]}), close=True)
+                    break
+                body = await self._read(reader.readexactly, length) if length else b""
+                started = False
+                await _write(writer, *await self.dispatch(method.upper(), path, body), close=close)
+                if close:
+                    break
+        except (asyncio.LimitOverrunError, ValueError):
+            # readline() past the stream limit (64 KiB): request line or a header too long
+            await _write_quietly(writer, 400, "Request line or header too long")
+        except asyncio.TimeoutError:
+            if started:
+                await _write_quietly(writer, 408, "Request not received in time")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765, ready=None):
+        # Runs until cancelled; ready(server) is called once the socket listens
+        self._slots = asyncio.Semaphore(self.workers)
+        server = await asyncio.start_server(self.handle, host, port)
+        if ready is not None:
+            ready(server)
+        try:
+            async with server:
+                try:
+                    await server.serve_forever()
+                finally:
+                    # the server has stopped listening: end the connections still open
+                    connections = list(self._connections)
+                    for task in connections:
+                        task.cancel()
+                    await asyncio.gather(*connections, return_exceptions=True)
+        finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _json_response(status: int, payload: dict, headers: dict | None = None) -> tuple[int, str, bytes, dict]:
+    return status, "application/json", json.dumps(payload, ensure_ascii=False).encode("utf-8"), headers or {}
+
+
+async def _write(writer: asyncio.StreamWriter, status: int, ctype: str, body: bytes, headers: dict, close: bool):
+    head = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {ctype}",
+            f"Content-Length: {len(body)}"]
+    head += [f"{k}: {v}" for k, v in headers.items()]
+    if close:
+        head.append("Connection: close")
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+
+async def _write_quietly(writer: asyncio.StreamWriter, status: int, message: str):
+    # Final error response on a connection that is being dropped anyway
+    try:
+        await _write(writer, *_json_response(status, {"error": message}), close=True)
+    except ConnectionError:
+        pass
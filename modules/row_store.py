@@ -0,0 +1,114 @@
+# modules/row_store.py
+# Columnar in-memory store of dividend and tax rows for one report year.
+#
+# One row is a position in parallel arrays: kind, date ordinal, interned ticker and currency
+# ids, amount and PLN amount in minor units (~29 bytes per row instead of a few dicts).
+# Report aggregates are one pass over the columns (pdf_report/year_stats.YearStats.from_store);
+# the nested JSON blocks are produced on export.
+
+from array import array
+from datetime import date
+
+from modules.money_utils import from_minor, to_minor
+from modules.statement_parser import DividendRow
+
+DIVIDEND, TAX = 0, 1
+# kind -> (year-block key, list key inside each ticker block)
+KIND_KEYS = (("dividends", "dividend"), ("taxes", "tax"))
+
+
+class RowStore:
+    __slots__ = ("kind", "day", "ticker", "currency", "amount", "pln", "tickers", "currencies", "_ids")
+
+    def __init__(self):
+        self.kind = array("b")
+        self.day = array("i")
+        self.ticker = array("I")
+        self.currency = array("I")
+        self.amount = array("q")
+        self.pln = array("q")
+        self.tickers: list[str] = []
+        self.currencies: list[str] = []
+        self._ids: tuple[dict, dict] = ({}, {})
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    @staticmethod
+    def _intern(name: str, names: list[str], ids: dict) -> int:
+        i = ids.get(name)
+        if i is None:
+            i = ids[name] = len(names)
+            names.append(name)
+        return i
+
+    def ticker_id(self, name: str) -> int:
+        return self._intern(name, self.tickers, self._ids[0])
+
+    def currency_id(self, code: str) -> int:
+        return self._intern(code, self.currencies, self._ids[1])
+
+    def append(self, kind: int, day: str, ticker: str, currency: str, amount: int, pln: int):
+        self.kind.append(kind)
+        self.day.append(date.fromisoformat(day).toordinal())
+        self.ticker.append(self.ticker_id(ticker))
+        self.currency.append(self.currency_id(currency))
+        self.amount.append(amount)
+        self.pln.append(pln)
+
+    def extend(self, rows, pln: list[int]):
+        # Parsed DividendRow/TaxRow rows with their PLN amounts in grosze
+        for row, amount_pln in zip(rows, pln):
+            kind = DIVIDEND if type(row) is DividendRow else TAX
+            self.append(kind, row.date, row.ticker, row.currency, row.amount, amount_pln)
+
+    @classmethod
+    def from_year_block(cls, year_block: dict) -> "RowStore":
+        # Load the 'dividends'/'taxes' blocks of a JSON year block
+        store = cls()
+        for kind, (key, rows_key) in enumerate(KIND_KEYS):
+            for blk in year_block.get(key, []) or []:
+                ticker = blk.get("ticker", "UNKNOWN")
+                store.ticker_id(ticker)
+                for rec in blk.get(rows_key, []) or []:
+                    if not rec.get("date"):
+                        continue
+                    store.append(
+                        kind, rec["date"], ticker, rec.get("currency") or "",
+                        to_minor(rec.get("amount", 0) or 0), to_minor(rec.get("amountPln", 0) or 0),
+                    )
+        return store
+
+    # --- aggregations (PLN, minor units) ---
+
+    def count(self, kind: int) -> int:
+        return self.kind.count(kind)
+
+    def total(self, kind: int) -> int:
+        return sum(p for k, p in zip(self.kind, self.pln) if k == kind)
+
+    # --- export ---
+
+    def to_blocks(self) -> dict[str, list]:
+        # {'dividends': [...], 'taxes': [...]} ticker blocks in order of first appearance
+        groups: dict[tuple[int, int], list[int]] = {}
+        for i, (k, t) in enumerate(zip(self.kind, self.ticker)):
+            groups.setdefault((k, t), []).append(i)
+        days: dict[int, str] = {}
+        out = {key: [] for key, _ in KIND_KEYS}
+        for (kind, t), idx in groups.items():
+            key, rows_key = KIND_KEYS[kind]
+            rows = []
+            for i in idx:
+                d = self.day[i]
+                s = days.get(d)
+                if s is None:
+                    s = days[d] = date.fromordinal(d).isoformat()
+                rows.append({
+                    "date": s,
+                    "currency": self.currencies[self.currency[i]],
+                    "amount": from_minor(self.amount[i]),
+                    "amountPln": from_minor(self.pln[i]),
+                })
+            out[key].append({"ticker": self.tickers[t], "currency": rows[0]["currency"], rows_key: rows})
+        return out
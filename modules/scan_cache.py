@@ -0,0 +1,132 @@
+# modules/scan_cache.py
+# Content-hash manifest of input statements with their cached parse results.
+#
+# Every parsed statement is stored once per content hash (all rows, unfiltered); the
+# manifest maps file paths to hashes. Files whose size and mtime did not change are not
+# re-hashed, files whose hash did not change are not re-parsed. Conversion to PLN is not
+# cached: it is cheap and is redone from the local rate store on every run.
+#
+# Several runs may share one cache directory (batch accounts, the report service next to
+# a CLI run): save() merges its changes into the manifest on disk and only deletes the
+# partials of digests this instance replaced or saw deleted, never those it does not know.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from modules.statement_parser import DividendRow, PeriodRow, StatementScan, TaxRow, scan_rows
+
+logger = logging.getLogger("scan_cache")
+
+CACHE_DIR = Path("cache") / "statements"
+
+# Bump when the parser output changes: every cached partial is then ignored
+PARSER_VERSION = 1
+
+
+def file_digest(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ScanCache:
+    def __init__(self, root=None):
+        self.root = Path(root) if root else CACHE_DIR
+        self._manifest_path = self.root / "manifest.json"
+        self._files = self._read_manifest()
+        self._changed: dict[str, dict] = {}  # entries set since the last save
+        self._replaced: set[str] = set()     # digests that entries pointed to before
+        self.hits = self.misses = 0
+
+    def _read_manifest(self) -> dict[str, dict]:
+        try:
+            data = json.loads(self._manifest_path.read_text(encoding="utf-8"))
+            if data.get("version") == PARSER_VERSION:
+                return data.get("files", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self._manifest_path}: {e}")
+        return {}
+
+    def _partial_path(self, digest: str) -> Path:
+        return self.root / "partials" / f"{digest}.json"
+
+    def _entry(self, path: str) -> tuple[str, dict]:
+        # (manifest key, current entry with an up-to-date digest)
+        p = Path(path)
+        st = p.stat()
+        key = str(p.resolve())
+        entry = self._files.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return key, entry
+        return key, {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": file_digest(p)}
+
+    def has(self, path: str) -> bool:
+        # Whether path has a cached partial, without loading it
+        key, entry = self._entry(path)
+        self._set(key, entry)
+        return self._partial_path(entry["sha256"]).exists()
+
+    def get(self, path: str, target_year=None) -> StatementScan | None:
+        # Cached scan of an unchanged statement, filtered to target_year; None on a miss
+        key, entry = self._entry(path)
+        self._set(key, entry)
+        try:
+            data = json.loads(self._partial_path(entry["sha256"]).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        rows = [PeriodRow(*data["period"])] if data["period"] else []
+        rows += [DividendRow(*r) for r in data["dividends"]]
+        rows += [TaxRow(*r) for r in data["taxes"]]
+        return scan_rows(path, rows, target_year)
+
+    def put(self, path: str, scan: StatementScan):
+        # Store an unfiltered scan of path (as returned by scan_statement(path))
+        key, entry = self._entry(path)
+        self._set(key, entry)
+        partial = self._partial_path(entry["sha256"])
+        partial.parent.mkdir(parents=True, exist_ok=True)
+        data = {"period": scan.period, "dividends": scan.dividends, "taxes": scan.taxes}
+        _write_atomic(partial, json.dumps(data, separators=(",", ":")))
+
+    def _set(self, key: str, entry: dict):
+        old = self._files.get(key)
+        if old == entry:
+            return
+        if old and old["sha256"] != entry["sha256"]:
+            self._replaced.add(old["sha256"])
+        self._files[key] = self._changed[key] = entry
+
+    def save(self):
+        # Merge this instance's entries into the manifest on disk (minus deleted files) and
+        # drop the partials of replaced digests that no entry points to any more
+        files = self._read_manifest()
+        files.update(self._changed)
+        gone = [k for k in files if not os.path.exists(k)]
+        dropped = self._replaced | {files.pop(k)["sha256"] for k in gone}
+        if not (self._changed or gone):
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        _write_atomic(self._manifest_path, json.dumps({"version": PARSER_VERSION, "files": files}, indent=1))
+        live = {e["sha256"] for e in files.values()}
+        for digest in dropped - live:
+            self._partial_path(digest).unlink(missing_ok=True)
+        self._files = files
+        self._changed = {}
+        self._replaced = set()
+
+
+def _write_atomic(path: Path, text: str):
+    # unique temporary name: other processes and threads may write the same path
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
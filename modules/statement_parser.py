@@ -0,0 +1,139 @@
+# modules/statement_parser.py
+# Single-pass streaming parser for IBKR activity statements (CSV).
+#
+# The file is read line by line once; every Dividends/Withholding Tax row is split exactly
+# once into a typed row. FX needs (currencies, date range) are gathered while streaming,
+# conversion to PLN happens later, once the rates are resolved.
+
+import logging
+from datetime import date
+from typing import Iterator, NamedTuple
+
+from modules import metrics
+from modules.date_parser import parse_period_line
+from modules.money_utils import parse_minor
+
+logger = logging.getLogger("statement_parser")
+
+PERIOD_PREFIX = "Statement,Data,Period,"
+DIVIDEND_PREFIX = "Dividends,Data,"
+TAX_PREFIX = "Withholding Tax,Data,"
+
+
+class PeriodRow(NamedTuple):
+    from_date: str
+    to_date: str
+    year: str
+
+
+class DividendRow(NamedTuple):
+    currency: str
+    date: str
+    ticker: str
+    amount: int  # minor units of `currency`
+
+
+class TaxRow(NamedTuple):
+    currency: str
+    date: str
+    ticker: str
+    amount: int  # minor units of `currency`, negative as reported
+
+
+def parse_ticker_from_desc(desc: str) -> str:
+    # Extract ticker before '('
+    try:
+        return desc.split("(")[0].strip()
+    except Exception:
+        return "UNKNOWN"
+
+
+def parse_cash_line(line: str, row_type=DividendRow):
+    # Split 'Dividends,Data,USD,2025-01-02,<desc>,4.4' into a typed row; None for totals/garbage
+    parts = [p.strip().strip('"') for p in line.split(",")]
+    if len(parts) < 6:
+        return None
+    currency, day, desc, amt = parts[2], parts[3], parts[4], parts[5]
+    try:
+        date.fromisoformat(day)
+        amount = parse_minor(amt)
+    except Exception:
+        return None
+    return row_type(currency, day, parse_ticker_from_desc(desc), amount)
+
+
+def iter_statement(file_path: str) -> Iterator[PeriodRow | DividendRow | TaxRow]:
+    # Yield the period header (first one only), then dividend and tax rows in file order
+    with open(file_path, encoding="utf-8-sig") as fh:
+        has_period = False
+        for raw in fh:
+            if raw.startswith(DIVIDEND_PREFIX):
+                row = parse_cash_line(raw, DividendRow)
+            elif raw.startswith(TAX_PREFIX):
+                row = parse_cash_line(raw, TaxRow)
+            elif not has_period and raw.startswith(PERIOD_PREFIX):
+                with metrics.span("parse.period"):
+                    info = parse_period_line(raw)
+                if info:
+                    has_period = True
+                    yield PeriodRow(info["fromDate"], info["toDate"], info["year"])
+                continue
+            else:
+                continue
+            if row is not None:
+                yield row
+
+
+class StatementScan:
+    # Parsed rows of one statement plus the FX needs gathered while streaming.
+
+    __slots__ = ("path", "period", "dividends", "taxes", "currencies", "min_date", "max_date")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.period: PeriodRow | None = None
+        self.dividends: list[DividendRow] = []
+        self.taxes: list[TaxRow] = []
+        self.currencies: dict[str, list[str]] = {}  # currency -> [min date, max date]
+        self.min_date: str | None = None
+        self.max_date: str | None = None
+
+    def rows(self) -> list:
+        # Period (if any) and rows, as accepted by scan_rows
+        return ([self.period] if self.period else []) + self.dividends + self.taxes
+
+    def release(self):
+        # Drop the rows once they are converted; period and FX needs stay
+        self.dividends = []
+        self.taxes = []
+
+    def add(self, row: DividendRow | TaxRow):
+        (self.dividends if type(row) is DividendRow else self.taxes).append(row)
+        # ISO dates compare correctly as strings
+        rng = self.currencies.get(row.currency.upper())
+        if rng is None:
+            self.currencies[row.currency.upper()] = [row.date, row.date]
+        elif row.date < rng[0]:
+            rng[0] = row.date
+        elif row.date > rng[1]:
+            rng[1] = row.date
+        if self.min_date is None or row.date < self.min_date:
+            self.min_date = row.date
+        if self.max_date is None or row.date > self.max_date:
+            self.max_date = row.date
+
+
+def scan_rows(file_path: str, rows, target_year=None) -> StatementScan:
+    # target_year: None (all rows), one year 'YYYY' or a collection of years
+    years = {target_year} if isinstance(target_year, str) else target_year
+    scan = StatementScan(file_path)
+    for row in rows:
+        if type(row) is PeriodRow:
+            scan.period = row
+        elif not years or row.date[:4] in years:
+            scan.add(row)
+    return scan
+
+
+def scan_statement(file_path: str, target_year=None) -> StatementScan:
+    return scan_rows(file_path, iter_statement(file_path), target_year)
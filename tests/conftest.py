@@ -1,6 +1,64 @@
 # tests/conftest.py
 import os
 import sys
+from datetime import date
+from pathlib import Path
+
+import pytest
 
 # Add project root to PYTHONPATH so `modules` becomes importable
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.nbp_stub import NbpStub, business_days, mid, serve  # noqa: E402
+
+EXAMPLES = Path(__file__).resolve().parent.parent / "example_broker_reports"
+
+
+@pytest.fixture
+def examples() -> list[Path]:
+    # The example IBKR statements, sorted by name
+    return sorted(EXAMPLES.glob("*.csv"))
+
+
+@pytest.fixture
+def daily_rates(monkeypatch) -> list:
+    # Replaces the NBP fetch of the report pipeline with one rate per business day that
+    # depends only on currency and date, so any FX plan converts the same way. Returns the
+    # list of request batches it received.
+    from modules import pipeline
+
+    calls = []
+
+    def fetch(requests):
+        calls.append(requests)
+        return {
+            (c, s, e): [{"effectiveDate": d.isoformat(), "mid": mid(c, d)}
+                        for d in business_days(date.fromisoformat(s), date.fromisoformat(e))]
+            for c, s, e in requests
+        }
+
+    monkeypatch.setattr(pipeline, "fetch_nbp_rates_many", fetch)
+    return calls
+
+
+@pytest.fixture
+def nbp_server(monkeypatch, tmp_path):
+    import modules.nbp as nbp
+
+    stub = NbpStub()
+    server, stub.url = serve(stub)
+    cache = tmp_path / "nbp_cache"
+    cache.mkdir()
+    monkeypatch.setattr(nbp, "CACHE_DIR", cache)
+    monkeypatch.setattr(nbp, "_stores", {})
+    stub.cache_dir = cache
+    stub.client = nbp.configure(base_url=stub.url, backoff=0.01, deadline=5.0)
+    yield stub
+    stub.client.close()
+    if nbp._client is not None:
+        nbp._client.close()
+    for store in nbp._stores.values():
+        store.close()
+    monkeypatch.setattr(nbp, "_client", None)
+    server.shutdown()
+    server.server_close()
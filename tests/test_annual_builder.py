@@ -0,0 +1,28 @@
+import io
+import json
+
+from modules.pdf_report.annual_builder import build_yearly_pdf, build_yearly_pdf_from_json
+from modules.pdf_report.year_stats import YearStats
+
+BLOCK = {
+    "year": "2024",
+    "dividends": [{"ticker": "KO", "currency": "USD", "dividend": [
+        {"date": "2024-01-02", "currency": "USD", "amount": 1.0, "amountPln": 4.01}]}],
+    "taxes": [{"ticker": "KO", "currency": "USD", "tax": [
+        {"date": "2024-01-02", "currency": "USD", "amount": -0.15, "amountPln": -0.6}]}],
+    "fx": {},
+}
+
+
+def test_build_yearly_pdf_in_memory():
+    for data in (BLOCK, YearStats.from_year_block(BLOCK)):
+        buf = io.BytesIO()
+        assert build_yearly_pdf(data, buf)
+        assert buf.getvalue().startswith(b"%PDF")
+
+
+def test_build_yearly_pdf_from_json_picks_year(tmp_path):
+    path = tmp_path / "divs.json"
+    path.write_text(json.dumps({"years": [dict(BLOCK, year="2023"), BLOCK]}))
+    assert build_yearly_pdf_from_json(str(path), str(tmp_path / "r.pdf"), "2024")
+    assert not build_yearly_pdf_from_json(str(path), str(tmp_path / "r.pdf"), "2022")
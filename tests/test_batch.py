@@ -0,0 +1,86 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from modules.batch import discover_accounts, process_accounts, write_index
+from modules.pipeline import process_years
+
+
+def _account(folder: Path, statements) -> Path:
+    folder.mkdir(parents=True)
+    for p in statements:
+        shutil.copy(p, folder / p.name)
+    return folder
+
+
+def test_discover_accounts_from_folders_prefixes_and_manifest(tmp_path, examples):
+    _account(tmp_path / "root" / "B", examples[:2])
+    shutil.copy(examples[2], tmp_path / "root" / "U111_202401_202401.csv")
+    shutil.copy(examples[3], tmp_path / "root" / "U111_202402_202402.csv")
+    (tmp_path / "root" / "no_statements").mkdir()
+
+    accounts = discover_accounts(tmp_path / "root")
+    assert [a.name for a in accounts] == ["B", "U111"]
+    assert [len(a.paths) for a in accounts] == [2, 2]
+
+    manifest = tmp_path / "accounts.json"
+    manifest.write_text(json.dumps({"X": "root/B", "Y": ["root/U111_202401_202401.csv"]}))
+    assert [(a.name, len(a.paths)) for a in discover_accounts(manifest)] == [("X", 2), ("Y", 1)]
+
+    shutil.copy(examples[0], tmp_path / "root" / "B_202401_202401.csv")
+    with pytest.raises(ValueError):
+        discover_accounts(tmp_path / "root")
+    with pytest.raises(ValueError):
+        discover_accounts(tmp_path / "missing")
+
+
+@pytest.mark.parametrize("workers, json_only", [(1, True), (2, True), (2, False)])
+def test_process_accounts_shares_fx_and_isolates_failures(tmp_path, examples, daily_rates, workers, json_only):
+    a = _account(tmp_path / "accounts" / "A", examples[:3])
+    _account(tmp_path / "accounts" / "B", examples[3:5])
+    broken = tmp_path / "accounts" / "C"
+    broken.mkdir()
+    (broken / "U1_202401_202401.csv").write_bytes(b"Dividends,Data,USD,2024-01-05,\xff\xfe,1\n")
+
+    results = process_accounts(discover_accounts(tmp_path / "accounts"), ["2024"], workers, out_dir=str(tmp_path / "out"),
+                               json_only=json_only)
+
+    assert len(daily_rates) == 1
+    assert [r["status"] for r in results] == ["ok", "ok", "failed"]
+    assert "UnicodeDecodeError" in results[2]["error"]
+    expected = process_years(str(a), ["2024"])
+    written = json.loads((tmp_path / "out" / "A" / "divs_2024.json").read_text(encoding="utf-8"))
+    assert written == json.loads(json.dumps(expected))
+    pdfs = [] if json_only else [str(tmp_path / "out" / name / "report_2024_full.pdf") for name in "AB"]
+    assert results[0]["files"] == [str(tmp_path / "out" / "A" / "divs_2024.json")] + pdfs[:1]
+    assert results[1]["files"][1:] == pdfs[1:]
+    assert all(Path(pdf).stat().st_size > 0 for pdf in pdfs)
+    assert results[0]["years"]["2024"]["dividends"] == sum(len(t["dividend"]) for t in expected["years"][0]["dividends"])
+
+    index = json.loads(Path(write_index(tmp_path / "out", results)).read_text(encoding="utf-8"))
+    assert index["statuses"] == {"ok": 2, "failed": 1}
+
+
+def test_fx_failure_of_one_account_does_not_stop_the_batch(tmp_path, examples, daily_rates, monkeypatch):
+    from modules import pipeline
+    from modules.nbp import NbpError
+
+    fetch = pipeline.fetch_nbp_rates_many
+
+    def failing(requests):
+        if any(c == "XYZ" for c, _, _ in requests):
+            raise NbpError("XYZ is not published")
+        return fetch(requests)
+
+    monkeypatch.setattr(pipeline, "fetch_nbp_rates_many", failing)
+    _account(tmp_path / "accounts" / "A", examples[:2])
+    odd = _account(tmp_path / "accounts" / "B", examples[2:3])
+    with open(next(odd.iterdir()), "a") as fh:
+        fh.write("Dividends,Data,XYZ,2024-01-05,ABC(US0000000001) Cash Dividend,1.00\n")
+
+    results = process_accounts(discover_accounts(tmp_path / "accounts"), ["2024"], out_dir=str(tmp_path / "out"),
+                               json_only=True)
+    assert [r["status"] for r in results] == ["ok", "failed"]
+    assert results[1]["error"].startswith("NbpError")
@@ -0,0 +1,45 @@
+import json
+
+from modules.exports import ColumnarSink, JsonlSink, read_columns
+from modules.report_builder import ReportBuilder
+from modules.statement_parser import DividendRow, TaxRow
+
+
+def _build(tmp_path):
+    sinks = [JsonlSink(tmp_path), ColumnarSink(tmp_path)]
+    rb = ReportBuilder(sinks)
+    rb.add_rows("2024", [DividendRow("USD", "2024-01-05", "AAPL", 779), TaxRow("USD", "2024-01-05", "AAPL", -117)], [3147, -473])
+    rb.add_rows("2024", [DividendRow("EUR", "2024-02-01", "SAP", 1190)], [5150])
+    rb.add_rows("2025", [DividendRow("USD", "2025-01-02", "KO", 100)], [400])
+    for s in sinks:
+        s.close()
+    return rb.build()
+
+
+def test_jsonl_export_has_one_flat_row_per_line(tmp_path):
+    _build(tmp_path)
+    rows = [json.loads(line) for line in (tmp_path / "rows_2024.jsonl").read_text().splitlines()]
+    assert [r["kind"] for r in rows] == ["dividend", "tax", "dividend"]
+    assert rows[1] == {"year": "2024", "kind": "tax", "date": "2024-01-05", "ticker": "AAPL",
+                       "currency": "USD", "amount": -1.17, "amountPln": -4.73}
+    assert (tmp_path / "rows_2025.jsonl").exists()
+
+
+def test_columnar_export_round_trips(tmp_path):
+    _build(tmp_path)
+    cols = read_columns(tmp_path / "rows_2024.columns")
+    schema = cols["schema"]
+    assert schema["rows"] == 3 and schema["tickers"] == ["AAPL", "SAP"] and schema["currencies"] == ["USD", "EUR"]
+    assert list(cols["kind"]) == [0, 1, 0]
+    assert list(cols["amount_pln"]) == [3147, -473, 5150]
+    assert list(cols["date"]) == [19727, 19727, 19754]  # days since 1970-01-01
+    assert [schema["tickers"][i] for i in cols["ticker"]] == ["AAPL", "AAPL", "SAP"]
+
+
+def test_sinks_remove_exports_of_earlier_runs(tmp_path):
+    _build(tmp_path)
+    sinks = [JsonlSink(tmp_path), ColumnarSink(tmp_path)]
+    ReportBuilder(sinks).add_rows("2024", [DividendRow("USD", "2024-01-05", "AAPL", 779)], [3147])
+    for s in sinks:
+        s.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["rows_2024.columns", "rows_2024.jsonl"]
@@ -0,0 +1,24 @@
+import pytest
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+
+from modules.pdf_report.font_utils import get_styles, register_fonts
+
+
+def test_register_fonts_once(monkeypatch):
+    assert register_fonts("fonts/DejaVuSans.ttf", "DejaVuSans") == "DejaVuSans"
+    assert "DejaVuSans" in pdfmetrics.getRegisteredFontNames()
+    monkeypatch.setattr(pdfmetrics, "registerFont", lambda font: pytest.fail("registered twice"))
+    assert register_fonts("fonts/DejaVuSans.ttf", "DejaVuSans") == "DejaVuSans"
+
+
+def test_style_changes_do_not_leak_between_calls():
+    styles = get_styles("DejaVuSans")
+    assert styles["H2Center"].alignment == 1 and styles["Heading2"].fontName == "DejaVuSans"
+    assert styles["h2"] is styles["Heading2"] and styles["H2Center"].parent is styles["Heading2"]
+    styles["Heading2"].alignment = 2
+    styles.add(ParagraphStyle("Mine", parent=styles["Heading2"]))
+    assert styles["Mine"].alignment == 2
+
+    fresh = get_styles("DejaVuSans")
+    assert fresh["Heading2"].alignment == 0 and "Mine" not in fresh.byName
@@ -0,0 +1,45 @@
+from datetime import date
+
+from modules.fx_planner import FxPlan, rates_between
+from modules.nbp import split_range
+
+
+def test_split_range_respects_api_limit():
+    windows = split_range(date(2024, 1, 1), date(2024, 12, 31))
+    assert len(windows) == 4
+    assert windows[0] == (date(2024, 1, 1), date(2024, 4, 2))
+    assert windows[-1][1] == date(2024, 12, 31)
+    assert all((e - s).days + 1 <= 93 for s, e in windows)
+
+
+def test_plan_merges_ranges_and_fetches_each_window_once():
+    plan = FxPlan()
+    plan.add("USD", date(2024, 1, 2), date(2024, 1, 30))
+    plan.add("USD", date(2024, 2, 1), date(2024, 2, 27))
+    plan.add("USD", date(2024, 1, 10), date(2024, 1, 12))
+    plan.add("EUR", date(2024, 6, 3), date(2024, 6, 3))
+    plan.add("PLN", date(2024, 6, 3), date(2024, 6, 3))
+    assert plan.currencies() == ["EUR", "USD"]
+    assert plan.windows("USD") == [("2024-01-02", "2024-02-27")]
+
+    calls = []
+
+    def fake_fetch_many(requests):
+        calls.extend(requests)
+        return {(c, s, e): [{"effectiveDate": e, "mid": 4.0}, {"effectiveDate": s, "mid": 3.9}] for c, s, e in requests}
+
+    rates = plan.fetch(fake_fetch_many)
+    assert calls == [("EUR", "2024-06-03", "2024-06-03"), ("USD", "2024-01-02", "2024-02-27")]
+    assert [r["effectiveDate"] for r in rates["USD"]] == ["2024-01-02", "2024-02-27"]
+    assert rates_between(rates["USD"], "2024-01-03", "2024-12-31") == [{"effectiveDate": "2024-02-27", "mid": 4.0}]
+
+
+def test_plan_covers_sparse_ranges_with_fewest_windows():
+    plan = FxPlan()
+    for month in range(1, 13):
+        plan.add("EUR", date(2024, month, 3), date(2024, month, 5))
+    windows = plan.windows("EUR")
+    assert len(windows) == 4
+    assert windows[0] == ("2024-01-03", "2024-04-04")
+    assert windows[1][0] == "2024-04-05"
+    assert windows[-1][1] == "2024-12-05"
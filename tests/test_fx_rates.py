@@ -0,0 +1,58 @@
+from datetime import date
+
+import pytest
+
+from modules.fx_rates import CALENDAR, FxRates, MissingRateError, RateMerger, RateTable, get_fx_rate
+
+
+def test_previous_business_day_skips_weekends_and_holidays():
+    assert CALENDAR.previous_business_day(date(2024, 3, 4)) == date(2024, 3, 1)    # Monday -> Friday
+    assert CALENDAR.previous_business_day(date(2024, 4, 2)) == date(2024, 3, 29)   # after Easter Monday
+    assert CALENDAR.previous_business_day(date(2024, 5, 2)) == date(2024, 4, 30)   # after May 1
+    assert CALENDAR.previous_business_day(date(2024, 1, 2)) == date(2023, 12, 29)  # across new year
+    assert not CALENDAR.is_business_day(date(2025, 12, 24))
+
+
+def test_rate_table_uses_last_rate_before_day():
+    table = RateTable.from_records("USD", [
+        {"date": "2024-03-01", "rate": 4.00},
+        {"date": "2024-02-29", "rate": 3.99},
+        {"date": "2024-03-04", "rate": 4.01},
+    ])
+    assert table.rate_for("2024-03-04") == 4.00  # Monday uses Friday
+    assert table.rate_for("2024-03-03") == 4.00  # Sunday uses Friday
+    assert table.rate_for("2024-03-05") == 4.01
+    with pytest.raises(MissingRateError):
+        table.rate_for("2024-02-29")
+
+
+def test_stale_rate_fallback_is_capped_and_warned_once(caplog):
+    table = RateTable.from_records("USD", [{"date": "2024-03-01", "rate": 4.00}])
+    with caplog.at_level("WARNING", logger="fx_rates"):
+        assert table.rate_for("2024-03-06") == 4.00  # 2024-03-05 is missing
+        assert table.rate_for("2024-03-06") == 4.00
+        assert table.rate_for("2024-03-09") == 4.00  # 2024-03-08 is missing
+    assert len(caplog.records) == 2
+    with pytest.raises(MissingRateError):
+        table.rate_for("2024-03-12")  # 2024-03-11 is 10 days after the last rate
+
+
+def test_get_fx_rate_pln_and_missing_currency():
+    fx = FxRates.from_fx({"USD": [{"date": "2024-12-31", "rate": 4.10}]})
+    assert get_fx_rate(fx, "pln", "2025-01-02") == 1.0
+    assert get_fx_rate({"USD": [{"date": "2024-12-31", "rate": 4.10}]}, "usd", "2025-01-02") == 4.10
+    with pytest.raises(MissingRateError):
+        get_fx_rate(fx, "EUR", "2025-01-02")
+
+
+def test_rate_merger_dedupes_and_keeps_order():
+    fx = {}
+    m = RateMerger(fx)
+    assert m.add("USD", [{"effectiveDate": "2024-02-01", "mid": 4.0}, {"effectiveDate": "2024-02-02", "mid": 4.1}]) == 2
+    assert m.add("USD", [{"effectiveDate": "2024-02-02", "mid": 9.9}, {"effectiveDate": "2024-02-05", "mid": 4.2}]) == 1
+    assert m.add("USD", [{"effectiveDate": "2024-01-31", "mid": 3.9}]) == 1
+    assert [r["date"] for r in fx["USD"]] == ["2024-01-31", "2024-02-01", "2024-02-02", "2024-02-05"]
+    assert fx["USD"][2]["rate"] == 4.1
+
+    # seeding from an existing block keeps deduplication across instances
+    assert RateMerger(fx).add("USD", [{"effectiveDate": "2024-02-01", "mid": 1.0}]) == 0
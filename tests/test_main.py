@@ -0,0 +1,24 @@
+from pathlib import Path
+
+import pytest
+
+import main
+
+
+def test_import_has_no_side_effects_and_skips_reportlab(tmp_path):
+    import subprocess
+    import sys
+
+    root = Path(__file__).resolve().parent.parent
+    code = "import sys; sys.path.insert(0, sys.argv[1]); import main; print('reportlab' in sys.modules)"
+    res = subprocess.run([sys.executable, "-c", code, str(root)], cwd=tmp_path, capture_output=True, text=True, check=True)
+    assert res.stdout.strip() == "False"
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("argv", [["--year", "2024", "--years", "2023"], ["--years", "2023", "--all-years"]])
+def test_year_options_are_mutually_exclusive(argv, capsys):
+    with pytest.raises(SystemExit) as e:
+        main.main(argv)
+    assert e.value.code == 2
+    assert "not allowed with argument" in capsys.readouterr().err
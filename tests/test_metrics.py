@@ -0,0 +1,85 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+import main
+import modules.nbp as nbp
+from modules import metrics
+
+
+@pytest.fixture
+def enabled():
+    m = metrics.enable()
+    yield m
+    metrics.disable()
+
+
+def test_disabled_metrics_are_no_ops():
+    assert metrics.active() is None
+    with metrics.span("x"):
+        metrics.count("y")
+    assert metrics.span("x") is metrics.span("z")
+
+
+def test_spans_and_counters_add_up(enabled, tmp_path):
+    for _ in range(3):
+        with metrics.span("stage"):
+            metrics.count("rows", 2)
+    with pytest.raises(ValueError):
+        with metrics.span("failing"):
+            raise ValueError
+    data = json.loads(Path(metrics.write(tmp_path / "m.json")).read_text())
+    assert data["spans"]["stage"]["calls"] == 3
+    assert data["spans"]["failing"]["calls"] == 1
+    assert data["counters"] == {"rows": 6}
+    assert data["wall_seconds"] >= data["spans"]["stage"]["seconds"]
+
+
+def test_http_requests_and_bytes_are_counted(enabled, nbp_server):
+    nbp_server.rates["USD"] = {"2025-01-02": 4.10, "2025-01-03": 4.12}
+    nbp_server.fail = [503]
+    nbp.fetch_nbp_rates_range("USD", "2025-01-01", "2025-01-31")
+    counters = enabled.to_dict()["counters"]
+    assert counters["http.requests"] == len(nbp_server.requests) == 2
+    assert counters["http.errors"] == 1
+    assert counters["http.bytes"] > 0
+    assert (counters["fx.store.covered"], counters["fx.store.missing"], counters["fx.store.gaps"]) == (0, 1, 1)
+
+    nbp.fetch_nbp_rates_range("USD", "2025-01-02", "2025-01-03")
+    assert enabled.to_dict()["counters"]["fx.store.covered"] == 1
+
+
+def test_profile_writes_stage_metrics(tmp_path, monkeypatch, examples, daily_rates):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "broker_reports").mkdir()
+    paths = examples[:3]
+    for p in paths:
+        shutil.copy(p, tmp_path / "broker_reports" / p.name)
+
+    main.main(["--year", "2024", "--json-only", "--no-cache", "--profile", "out/metrics.json"])
+
+    assert metrics.active() is None
+    data = json.loads((tmp_path / "out" / "metrics.json").read_text())
+    assert {"parse", "parse.period", "fx.plan", "fx.fetch", "convert", "aggregate", "json.write"} <= set(data["spans"])
+    assert data["counters"]["statements"] == len(paths)
+    assert data["counters"]["rows.dividends"] > 0
+    assert data["counters"]["json.bytes"] == (tmp_path / "tax_reports" / "divs_2024.json").stat().st_size
+
+
+def test_worker_metrics_are_merged(enabled, tmp_path, examples, daily_rates):
+    from modules import pipeline
+
+    for p in examples[:3]:
+        shutil.copy(p, tmp_path / p.name)
+    pipeline.process_years(str(tmp_path), ["2024"])
+    serial = enabled.to_dict()
+    parallel = metrics.enable()
+    pipeline.process_years(str(tmp_path), ["2024"], jobs=2)
+    data = parallel.to_dict()
+
+    assert data["counters"] == serial["counters"]
+    assert {k: v["calls"] for k, v in data["spans"].items()} == {k: v["calls"] for k, v in serial["spans"].items()}
+    assert data["spans"]["parse.period"]["calls"] == 2 * 3  # scanned, then parsed again to convert
+
@@ -1,5 +1,23 @@
-from modules.money_utils import money
+from modules.money_utils import convert_minor, div_half_even, format_minor, money, parse_minor, rate_units, to_minor
 
 def test_money_round_half_even():
     assert money(2.345) == 2.34  # 4 is even
     assert money(2.355) == 2.36  # 5 rounds to even (6)
+
+def test_parse_minor():
+    assert parse_minor("4.4") == 440
+    assert parse_minor("-0.665") == -66  # half-even on the third decimal
+    assert parse_minor("0.675") == 68
+    assert parse_minor("12") == 1200
+
+
+def test_convert_minor_half_even():
+    assert div_half_even(-5, 10) == 0
+    assert div_half_even(-15, 10) == -2
+    assert convert_minor(100, rate_units(4.0123)) == 401  # 4.0123 PLN -> 4.01
+    assert convert_minor(-15, rate_units(4.1)) == -62  # -0.615 -> -0.62
+    assert format_minor(-5) == "-0.05"
+
+
+def test_sums_do_not_drift():
+    assert sum([to_minor(0.1)] * 10) == 100
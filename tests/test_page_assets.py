@@ -0,0 +1,30 @@
+import io
+
+from reportlab.platypus import SimpleDocTemplate
+
+from modules.pdf_report.page_assets import DEFAULT_FRAME_HEIGHT, AssetRows, make_assets_page
+from modules.pdf_report.year_stats import YearStats
+
+
+def _stats(n):
+    divs = [{"ticker": f"T{i:04d}", "currency": "USD",
+             "dividend": [{"date": "2024-03-01", "currency": "USD", "amount": 1.0, "amountPln": 4.0}]}
+            for i in range(n)]
+    return YearStats.from_year_block({"year": "2024", "dividends": divs, "taxes": []})
+
+
+def test_fast_assets_pages_fit_the_frame():
+    elements = make_assets_page(_stats(1000))  # above FAST_PATH_ROWS
+    blocks = [e for e in elements if isinstance(e, AssetRows)]
+    assert sum(len(b.rows) for b in blocks) == 1000
+    assert blocks[0].rows[0][0] == "T0000" and blocks[-1].rows[-1][0] == "T0999"
+    assert all(b.height <= DEFAULT_FRAME_HEIGHT for b in blocks)
+
+
+def test_fast_assets_build_one_page_per_block():
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf)
+    elements = make_assets_page(_stats(200), fast=True, frame_height=doc.height - 12)
+    blocks = len([e for e in elements if isinstance(e, AssetRows)])
+    doc.build(elements)
+    assert doc.page == blocks
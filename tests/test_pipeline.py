@@ -0,0 +1,144 @@
+import json
+import shutil
+
+import pytest
+
+from modules import pipeline
+
+
+def test_process_all_reports_parallel_matches_serial(tmp_path, examples, daily_rates):
+    for p in examples[:4]:
+        shutil.copy(p, tmp_path / p.name)
+
+    serial = pipeline.process_all_reports(str(tmp_path), "2024")
+    parallel = pipeline.process_all_reports(str(tmp_path), "2024", jobs=3)
+    assert serial["years"][0]["dividends"]
+    assert json.dumps(parallel) == json.dumps(serial)
+
+
+def test_process_years_matches_single_year_runs(tmp_path, examples, daily_rates):
+    for p in examples[:3]:
+        shutil.copy(p, tmp_path / p.name)
+        (tmp_path / p.name.replace("2024", "2023")).write_text(p.read_text().replace("2024", "2023"))
+
+    data = pipeline.process_years(str(tmp_path), ["2023", "2024"])
+    assert [yb["year"] for yb in data["years"]] == ["2023", "2024"]
+    for yb in data["years"]:
+        single = pipeline.process_years(str(tmp_path), [yb["year"]])
+        assert single["years"] == [yb]
+    assert pipeline.process_years(str(tmp_path)) == data
+
+
+def test_parse_years():
+    assert pipeline.parse_years("2019-2021") == ["2019", "2020", "2021"]
+    assert pipeline.parse_years("2023,2021") == ["2021", "2023"]
+    with pytest.raises(ValueError):
+        pipeline.parse_years("2021-2019")
+
+
+def test_cached_run_parses_only_changed_statements(tmp_path, monkeypatch, examples, daily_rates):
+    from modules.scan_cache import ScanCache
+
+    folder = tmp_path / "reports"
+    folder.mkdir()
+    for p in examples[:3]:
+        shutil.copy(p, folder / p.name)
+    expected = pipeline.process_years(str(folder), ["2024"])
+    assert pipeline.process_years(str(folder), ["2024"], cache=ScanCache(tmp_path / "cache")) == expected
+
+    parsed = []
+    real = pipeline.scan_statement
+    monkeypatch.setattr(pipeline, "scan_statement", lambda p, y=None: parsed.append(p) or real(p, y))
+    assert pipeline.process_years(str(folder), ["2024"], cache=ScanCache(tmp_path / "cache")) == expected
+    assert parsed == []
+
+    last = sorted(folder.iterdir())[-1]
+    with open(last, "a") as fh:
+        fh.write("Dividends,Data,USD,2024-03-20,NEW(FAKE) Cash Dividend,1.00\n")
+    data = pipeline.process_years(str(folder), ["2024"], cache=ScanCache(tmp_path / "cache"))
+    assert parsed == [str(last)]
+    assert data == pipeline.process_years(str(folder), ["2024"])
+
+
+def test_year_stores_match_the_built_year_blocks(tmp_path, examples, daily_rates):
+    from modules.pdf_report.year_stats import YearStats
+
+    for p in examples[:3]:
+        shutil.copy(p, tmp_path / p.name)
+    report = pipeline.collect_years(str(tmp_path), ["2024"])
+    data = pipeline.build_report(report)
+    stores = pipeline.year_stores(report, data)
+    for yb in data["years"]:
+        a, b = YearStats.from_store(stores[yb["year"]], yb["year"]), YearStats.from_year_block(yb)
+        assert {k: getattr(a, k) for k in YearStats.__slots__} == {k: getattr(b, k) for k in YearStats.__slots__}
+
+
+def test_scans_release_their_rows_once_converted(tmp_path, monkeypatch, examples, daily_rates):
+    for p in examples[:2]:
+        shutil.copy(p, tmp_path / p.name)
+    scans = []
+    real = pipeline.scan_statement
+    monkeypatch.setattr(pipeline, "scan_statement", lambda p, y=None: scans.append(real(p, y)) or scans[-1])
+
+    report = pipeline.collect_years(str(tmp_path), ["2024"])
+    assert len(report.rows("2024")) > 0
+    # each statement is scanned for its FX needs, then parsed again to be converted
+    assert [(s.dividends, s.taxes) for s in scans] == [([], [])] * 4
+    assert all(s.period and s.currencies for s in scans)
+
+
+def test_first_rate_day_missing_falls_back_to_an_earlier_rate(tmp_path, monkeypatch):
+    # 2024-01-03 needs the 2024-01-02 rate, which NBP did not publish here
+    (tmp_path / "U1_202401_202401.csv").write_text(
+        'Statement,Data,Period,"January 1, 2024 - January 31, 2024"\n'
+        "Dividends,Data,USD,2024-01-03,AAPL(FAKE) Cash Dividend,10.00\n"
+    )
+    published = {"2023-12-28": 3.9, "2023-12-29": 4.0, "2024-01-03": 4.2}
+
+    def fetch(requests):
+        return {(c, s, e): [{"effectiveDate": d, "mid": m} for d, m in published.items() if s <= d <= e]
+                for c, s, e in requests}
+
+    monkeypatch.setattr(pipeline, "fetch_nbp_rates_many", fetch)
+    yb = pipeline.process_years(str(tmp_path), ["2024"])["years"][0]
+    assert yb["dividends"][0]["dividend"][0]["amountPln"] == 40.0
+    assert yb["fx"] == {"USD": [{"date": "2023-12-29", "rate": 4.0}]}
+
+
+@pytest.mark.parametrize("cached", [False, True])
+def test_only_one_scan_holds_rows_at_a_time(tmp_path, monkeypatch, examples, daily_rates, cached):
+    from modules.scan_cache import ScanCache
+    from modules.statement_parser import StatementScan
+
+    folder = tmp_path / "reports"
+    folder.mkdir()
+    for p in examples[:4]:
+        shutil.copy(p, folder / p.name)
+    cache = ScanCache(tmp_path / "cache") if cached else None
+    expected = pipeline.process_years(str(folder), ["2024"])
+
+    scans, held = [], []
+
+    def holding() -> int:
+        return sum(1 for s in scans if s.dividends or s.taxes)
+
+    real_add, real_apply = StatementScan.add, pipeline.apply_scan
+
+    def add(self, row):
+        if not scans or scans[-1] is not self:
+            held.append(holding())
+            scans.append(self)
+        real_add(self, row)
+
+    def apply_scan(scan, *args):
+        held.append(holding())
+        real_apply(scan, *args)
+
+    monkeypatch.setattr(StatementScan, "add", add)
+    monkeypatch.setattr(pipeline, "apply_scan", apply_scan)
+    for _ in range(2 if cached else 1):  # a cold and a warm cache
+        scans.clear()
+        assert pipeline.process_years(str(folder), ["2024"], cache=cache) == expected
+        assert held and max(held) <= 1
+        assert holding() == 0
+
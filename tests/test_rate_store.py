@@ -0,0 +1,32 @@
+from datetime import date
+
+from modules.rate_store import RateStore
+
+
+def test_store_tracks_coverage_and_answers_subranges(tmp_path):
+    store = RateStore(tmp_path / "rates.sqlite3")
+    store.put("usd", "2025-01-01", "2025-01-31", [{"effectiveDate": "2025-01-02", "mid": 4.1}])
+    store.put("USD", "2025-03-01", "2025-03-31", [{"effectiveDate": "2025-03-03", "mid": 4.0}])
+    assert store.missing("USD", "2025-01-10", "2025-01-20") == []
+    assert store.missing("USD", "2024-12-20", "2025-03-05") == [
+        (date(2024, 12, 20), date(2024, 12, 31)),
+        (date(2025, 2, 1), date(2025, 2, 28)),
+    ]
+
+    # adjacent ranges collapse into one covered interval
+    store.put("USD", "2025-02-01", "2025-02-28", [])
+    assert store.coverage("USD") == [(date(2025, 1, 1), date(2025, 3, 31))]
+    store.close()
+
+    reopened = RateStore(tmp_path / "rates.sqlite3")
+    assert reopened.coverage("USD") == [(date(2025, 1, 1), date(2025, 3, 31))]
+    assert reopened.rates("USD", "2025-01-01", "2025-12-31") == [
+        {"effectiveDate": "2025-01-02", "mid": 4.1},
+        {"effectiveDate": "2025-03-03", "mid": 4.0},
+    ]
+
+
+def test_store_never_covers_today(tmp_path):
+    store = RateStore(tmp_path / "rates.sqlite3")
+    store.put("EUR", "2025-06-01", "2025-06-30", [], today=date(2025, 6, 20))
+    assert store.missing("EUR", "2025-06-01", "2025-06-30") == [(date(2025, 6, 20), date(2025, 6, 30))]
@@ -1,24 +1,11 @@
 # tests/test_rates.py
-import json
-from unittest.mock import patch
-from pathlib import Path
-import modules.nbp as nbp
+import pytest
 
+import modules.nbp as nbp
 
-@patch("modules.nbp.urllib.request.urlopen")
-def test_fetch_nbp_rates_range_uses_http_and_cache(mock_urlopen, tmp_path, monkeypatch):
-    # изолируем кэш в temp каталоге, чтобы не было попаданий в старый кэш
-    new_cache = tmp_path / "nbp_cache"
-    new_cache.mkdir(parents=True, exist_ok=True)
-    monkeypatch.setattr(nbp, "CACHE_DIR", new_cache)
 
-    # мок HTTP-ответа NBP (RAW формат)
-    mock_urlopen.return_value.__enter__.return_value.read.return_value = json.dumps({
-        "rates": [
-            {"effectiveDate": "2025-01-02", "mid": 4.10},
-            {"effectiveDate": "2025-01-03", "mid": 4.12},
-        ]
-    }).encode("utf-8")
+def test_fetch_nbp_rates_range_uses_http_and_cache(nbp_server):
+    nbp_server.rates["USD"] = {"2025-01-02": 4.10, "2025-01-03": 4.12}
 
     # 1-й вызов → должен сходить в HTTP
     rates = nbp.fetch_nbp_rates_range("USD", "2025-01-01", "2025-01-31")
@@ -27,11 +14,100 @@ def test_fetch_nbp_rates_range_uses_http_and_cache(mock_urlopen, tmp_path, monke
     assert rates[0]["effectiveDate"] == "2025-01-02"
     assert rates[0]["mid"] == 4.10
 
-    # убедимся, что кэш-файл создан
-    cache_file = new_cache / "USD_2025-01-01_2025-01-31.json"
-    assert cache_file.exists()
+    # убедимся, что кэш создан
+    assert (nbp_server.cache_dir / "rates.sqlite3").exists()
 
     # 2-й вызов → должен брать из кэша, новых HTTP-вызовов не должно быть
     rates2 = nbp.fetch_nbp_rates_range("USD", "2025-01-01", "2025-01-31")
     assert rates2 == rates
-    mock_urlopen.assert_called_once()
+    assert len(nbp_server.requests) == 1
+
+    # подынтервал тоже из кэша, пересекающийся диапазон докачивает только разрыв
+    assert nbp.fetch_nbp_rates_range("USD", "2025-01-03", "2025-01-10") == rates[1:]
+    nbp.fetch_nbp_rates_range("USD", "2025-01-15", "2025-02-10")
+    assert nbp_server.requests[1:] == ["/api/exchangerates/rates/a/USD/2025-02-01/2025-02-10?format=json"]
+
+
+def test_client_retries_transient_errors(nbp_server):
+    nbp_server.rates["EUR"] = {"2025-01-02": 4.27}
+    nbp_server.fail = [503, 500]
+    assert nbp_server.client.fetch_rates("EUR", "2025-01-01", "2025-01-05") == [{"effectiveDate": "2025-01-02", "mid": 4.27}]
+    assert len(nbp_server.requests) == 3
+
+
+def test_failures_are_reported_and_not_cached(nbp_server):
+    nbp_server.fail = [500] * 10
+    with pytest.raises(nbp.NbpError, match="gave up"):
+        nbp.fetch_nbp_rates_range("USD", "2025-01-01", "2025-01-31")
+    assert nbp.get_store().missing("USD", "2025-01-01", "2025-01-31")
+
+    # 404 means "no data in range" and is not an error
+    nbp_server.fail = []
+    assert nbp.fetch_nbp_rates_range("USD", "2025-01-04", "2025-01-05") == []
+    assert nbp.get_store().missing("USD", "2025-01-04", "2025-01-05") == []
+
+
+def test_fetch_many_is_concurrent_over_reused_connections(nbp_server):
+    nbp_server.rates["USD"] = {f"2025-01-{d:02d}": 4.0 + d / 100 for d in range(2, 31)}
+    client = nbp.configure(base_url=nbp_server.url, concurrency=2)
+    requests = [("USD", f"2025-01-{d:02d}", f"2025-01-{d:02d}") for d in range(2, 22)]
+    out = client.fetch_many(requests)
+    client.close()
+    assert out[("USD", "2025-01-10", "2025-01-10")] == [{"effectiveDate": "2025-01-10", "mid": 4.1}]
+    assert len(nbp_server.requests) == 20
+    assert len(nbp_server.peers) <= 2
+
+
+def test_long_ranges_are_split_into_api_windows(nbp_server):
+    nbp_server.rates["USD"] = {"2024-01-02": 3.99, "2024-06-03": 3.95, "2024-12-31": 4.10}
+    rates = nbp.fetch_nbp_rates_range("USD", "2024-01-01", "2024-12-31")
+    assert [r["effectiveDate"] for r in rates] == ["2024-01-02", "2024-06-03", "2024-12-31"]
+    assert len(nbp_server.requests) == 4
+    assert nbp.get_store().missing("USD", "2024-01-01", "2024-12-31") == []
+
+
+def test_bulk_mode_fills_all_currencies_from_tables(nbp_server):
+    nbp_server.rates["USD"] = {"2024-03-01": 3.98, "2024-03-04": 3.97}
+    nbp_server.rates["EUR"] = {"2024-03-01": 4.32, "2024-03-04": 4.31}
+    nbp_server.rates["CHF"] = {"2024-03-01": 4.50}
+    nbp.configure(base_url=nbp_server.url, bulk=True)
+    out = nbp.fetch_nbp_rates_many([("USD", "2024-03-01", "2024-03-31"), ("EUR", "2024-03-01", "2024-03-31")])
+    assert out[("EUR", "2024-03-01", "2024-03-31")][1] == {"effectiveDate": "2024-03-04", "mid": 4.31}
+    assert nbp_server.requests == ["/api/exchangerates/tables/a/2024-03-01/2024-03-31?format=json"]
+
+    # the same tables also filled currencies nobody asked for
+    assert nbp.fetch_nbp_rates_range("CHF", "2024-03-01", "2024-03-31") == [{"effectiveDate": "2024-03-01", "mid": 4.5}]
+    assert len(nbp_server.requests) == 1
+
+
+def test_offline_mode_uses_prefetched_rates_or_fails_fast(nbp_server, tmp_path):
+    nbp_server.rates["USD"] = {"2024-03-01": 3.98}
+    nbp.configure(base_url=nbp_server.url, offline=True)
+    with pytest.raises(nbp.NbpOfflineError, match="USD 2024-03-01..2024-03-31"):
+        nbp.fetch_nbp_rates_range("USD", "2024-03-01", "2024-03-31")
+    assert nbp_server.requests == []
+
+    nbp.configure(base_url=nbp_server.url)
+    assert nbp.prefetch_rates("2024-02-01", "2024-03-31", ["usd"]) == {"USD": 1}
+    snapshot = tmp_path / "fx_snapshot.json"
+    assert nbp.get_store().export_snapshot(snapshot, "2024-03-01", "2024-03-31") == 1
+
+    # a fresh offline host that only has the snapshot
+    from modules.rate_store import RateStore
+    store = RateStore(tmp_path / "offline.sqlite3")
+    assert store.import_snapshot(snapshot) == 1
+    assert store.missing("USD", "2024-03-01", "2024-03-31") == []
+    assert store.rates("USD", "2024-03-01", "2024-03-31") == [{"effectiveDate": "2024-03-01", "mid": 3.98}]
+    store.close()
+
+
+def test_prefetch_all_currencies_fetches_only_missing_days(nbp_server):
+    nbp_server.rates.update({"USD": {"2024-03-01": 3.98, "2024-04-02": 3.97}, "EUR": {"2024-03-01": 4.31}})
+    assert nbp.prefetch_rates("2024-03-01", "2024-03-31") == {"EUR": 1, "USD": 1}
+    assert len(nbp_server.requests) == 1
+
+    assert nbp.prefetch_rates("2024-03-01", "2024-03-31") == {"EUR": 1, "USD": 1}
+    assert len(nbp_server.requests) == 1  # nothing new to fetch
+
+    assert nbp.prefetch_rates("2024-03-15", "2024-04-10") == {"EUR": 0, "USD": 1}
+    assert nbp_server.requests[-1] == "/api/exchangerates/tables/a/2024-04-01/2024-04-10?format=json"
@@ -0,0 +1,41 @@
+from modules.dividend_processor import add_dividend_to_report
+from modules.report_builder import ReportBuilder
+from modules.statement_parser import DividendRow, TaxRow
+from modules.tax_processor import add_tax_to_report
+
+
+def _rec(row, pln):
+    return {"ticker": row.ticker, "currency": row.currency, "date": row.date, "amount": row.amount / 100, "amountPln": pln / 100}
+
+
+def test_report_builder_matches_add_to_report():
+    rows = [DividendRow("USD", "2025-01-02", "AAPL", 100), TaxRow("USD", "2025-01-02", "AAPL", -15),
+            DividendRow("USD", "2025-01-03", "KO", 200), DividendRow("USD", "2025-02-02", "AAPL", 300)]
+    pln = [400, -60, 800, 1200]
+
+    legacy = {"years": []}
+    for r, p in zip(rows, pln):
+        add = add_dividend_to_report if type(r) is DividendRow else add_tax_to_report
+        add(legacy, "2025", _rec(r, p))
+
+    rb = ReportBuilder()
+    rb.add_rows("2025", rows, pln)
+    assert rb.build() == legacy
+
+
+def test_report_builder_keeps_period_of_first_statement():
+    rb = ReportBuilder()
+    rb.year_block("2025", "2025-01-01", "2025-01-31")
+    rb.year_block("2025", "2025-02-01", "2025-02-28")
+    rb.fx_merger("2025").add("USD", [{"effectiveDate": "2024-12-31", "mid": 4.1}])
+    yb = rb.build()["years"][0]
+    assert (yb["fromDate"], yb["toDate"]) == ("2025-01-01", "2025-01-31")
+    assert yb["fx"] == {"USD": [{"date": "2024-12-31", "rate": 4.1}]}
+
+
+def test_report_builder_add_rows_minor_units():
+    rb = ReportBuilder()
+    rb.add_rows("2025", [DividendRow("USD", "2025-01-02", "AAPL", 440), TaxRow("USD", "2025-01-02", "AAPL", -66)], [1804, -271])
+    yb = rb.build()["years"][0]
+    assert yb["dividends"][0]["dividend"] == [{"date": "2025-01-02", "currency": "USD", "amount": 4.4, "amountPln": 18.04}]
+    assert yb["taxes"][0]["tax"][0]["amountPln"] == -2.71
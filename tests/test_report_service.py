@@ -0,0 +1,134 @@
+import asyncio
+import http.client
+import json
+import shutil
+import socket
+import threading
+import time
+
+import pytest
+
+from modules import pipeline
+from modules.report_builder import ReportBuilder
+from modules.report_service import ReportService
+
+
+@pytest.fixture
+def start_service():
+    # start_service(**kwargs) -> (service, port); asyncio.run() runs the service on a
+    # background thread, so teardown cancels and awaits every task before the loop closes
+    started = []
+
+    def start(**kwargs):
+        service = ReportService(**kwargs)
+        ready = threading.Event()
+        running = []
+
+        async def main():
+            running.append((asyncio.get_running_loop(), asyncio.current_task()))
+            await service.serve("127.0.0.1", 0, lambda server: running.append(server) or ready.set())
+
+        def run():
+            try:
+                asyncio.run(main())
+            except asyncio.CancelledError:
+                pass
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        assert ready.wait(5)
+        (loop, task), server = running
+        started.append((loop, task, thread))
+        return service, server.sockets[0].getsockname()[1]
+
+    yield start
+    for loop, task, thread in started:
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(5)
+        assert not thread.is_alive()
+
+
+def _request(port: int, method: str, path: str, body=None, conn=None):
+    conn = conn or http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    conn.request(method, path, body=json.dumps(body) if body is not None else None)
+    resp = conn.getresponse()
+    return resp.status, resp.getheader("Content-Type"), resp.read()
+
+
+def test_reports_from_folder_and_uploaded_statements(start_service, tmp_path, examples, daily_rates):
+    for p in examples[:3]:
+        shutil.copy(p, tmp_path / p.name)
+    service, port = start_service(root=tmp_path)
+    expected = json.loads(json.dumps(pipeline.process_years(str(tmp_path), ["2024"])))
+
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)  # one keep-alive connection
+    status, ctype, body = _request(port, "POST", "/reports", {"folder": str(tmp_path), "years": "2024"}, conn)
+    assert (status, ctype) == (200, "application/json")
+    assert json.loads(body) == expected
+
+    statements = {p.name: p.read_text(encoding="utf-8") for p in sorted(tmp_path.glob("*.csv"))}
+    status, _, body = _request(port, "POST", "/reports", {"statements": statements, "years": "2024"}, conn)
+    assert status == 200
+    assert json.loads(body)["years"][0]["dividends"] == expected["years"][0]["dividends"]
+    assert len(daily_rates) == 2  # the second job reuses the rate tables of the first
+
+    assert _request(port, "POST", "/reports", {"folder": ".", "years": "2024"}, conn)[0] == 200
+    assert _request(port, "POST", "/reports", {"folder": str(tmp_path / "missing")}, conn)[0] == 404
+    assert _request(port, "POST", "/reports", {"folder": str(tmp_path.parent)}, conn)[0] == 403
+    assert _request(port, "POST", "/reports", {"folder": "../" + tmp_path.name + "/.."}, conn)[0] == 403
+    assert _request(port, "POST", "/reports", {"statements": {"../x.csv": "x"}}, conn)[0] == 400
+    assert _request(port, "POST", "/reports", {"folder": str(tmp_path), "years": "2025-2024"}, conn)[0] == 400
+    assert _request(port, "GET", "/reports", None, conn)[0] == 405
+    assert _request(port, "GET", "/health", None, conn)[0] == 200
+
+
+def test_full_queue_is_rejected_with_503(start_service, tmp_path):
+    release = threading.Event()
+    entered = threading.Semaphore(0)
+
+    def slow_process(folder, years):
+        entered.release()
+        release.wait(10)
+        report = ReportBuilder()
+        report.year_block("2024")
+        return report
+
+    service, port = start_service(workers=1, queue_size=1, root=tmp_path)
+    service.process = slow_process
+    results = []
+
+    def client():
+        results.append(_request(port, "POST", "/reports", {"folder": str(tmp_path)})[0])
+
+    threads = [threading.Thread(target=client) for _ in range(2)]
+    for t in threads:
+        t.start()
+    assert entered.acquire(timeout=5)
+    for _ in range(50):  # wait until the second job is queued
+        if service.queued == 1:
+            break
+        time.sleep(0.02)
+    status, _, body = _request(port, "POST", "/reports", {"folder": str(tmp_path)})
+    assert status == 503
+    assert json.loads(_request(port, "GET", "/health")[2])["running"] == 1
+
+    release.set()
+    for t in threads:
+        t.join(10)
+    assert results == [200, 200]
+
+
+def test_slow_and_oversized_requests_are_answered_and_closed(start_service):
+    _, port = start_service(read_timeout=0.2)
+
+    def raw(data: bytes) -> bytes:
+        with socket.create_connection(("127.0.0.1", port), timeout=5) as sock:
+            sock.sendall(data)
+            chunks = []
+            while chunk := sock.recv(65536):
+                chunks.append(chunk)
+            return b"".join(chunks)
+
+    assert raw(b"") == b""  # idle connection: closed without a response
+    assert raw(b"POST /reports HTTP/1.1\r\nContent-Length: 10\r\n\r\n{").startswith(b"HTTP/1.1 408")
+    assert raw(b"GET /health HTTP/1.1\r\nX-Big: " + b"a" * 70_000 + b"\r\n\r\n").startswith(b"HTTP/1.1 400")
@@ -0,0 +1,30 @@
+from modules.row_store import DIVIDEND, TAX, RowStore
+from modules.statement_parser import DividendRow, TaxRow
+
+
+def _store():
+    store = RowStore()
+    rows = [
+        DividendRow("USD", "2025-01-02", "KO", 100),
+        DividendRow("EUR", "2025-02-03", "AAPL", 200),
+        TaxRow("USD", "2025-01-02", "KO", -15),
+        DividendRow("USD", "2025-02-10", "KO", 300),
+    ]
+    store.extend(rows, [401, 860, -60, 1203])
+    return store
+
+
+def test_row_store_aggregations():
+    store = _store()
+    assert len(store) == 4 and store.tickers == ["KO", "AAPL"]
+    assert store.total(DIVIDEND) == 2464 and store.count(TAX) == 1
+    assert list(store.ticker) == [0, 1, 0, 0] and store.currencies == ["USD", "EUR"]
+
+
+def test_row_store_round_trips_year_block():
+    blocks = _store().to_blocks()
+    assert [b["ticker"] for b in blocks["dividends"]] == ["KO", "AAPL"]
+    assert blocks["dividends"][0]["dividend"][1] == {"date": "2025-02-10", "currency": "USD", "amount": 3.0, "amountPln": 12.03}
+    assert blocks["taxes"] == [{"ticker": "KO", "currency": "USD", "tax": [
+        {"date": "2025-01-02", "currency": "USD", "amount": -0.15, "amountPln": -0.6}]}]
+    assert RowStore.from_year_block(blocks).to_blocks() == blocks
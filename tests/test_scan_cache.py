@@ -0,0 +1,59 @@
+import shutil
+
+from modules.scan_cache import ScanCache
+from modules.statement_parser import scan_statement
+
+def _fields(scan):
+    return scan.period, scan.dividends, scan.taxes, scan.currencies, scan.min_date, scan.max_date
+
+
+def test_scan_cache_round_trip_and_invalidation(tmp_path, examples):
+    src = tmp_path / "s.csv"
+    shutil.copy(examples[0], src)
+    cache = ScanCache(tmp_path / "cache")
+    assert cache.get(str(src)) is None
+    cache.put(str(src), scan_statement(str(src)))
+    cache.save()
+
+    cache = ScanCache(tmp_path / "cache")
+    assert _fields(cache.get(str(src))) == _fields(scan_statement(str(src)))
+    assert _fields(cache.get(str(src), "2023")) == _fields(scan_statement(str(src), "2023"))
+
+    with open(src, "a") as fh:
+        fh.write("Dividends,Data,USD,2024-01-30,NEW(FAKE) Cash Dividend,1.00\n")
+    assert cache.get(str(src)) is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_scan_cache_drops_deleted_files(tmp_path, examples):
+    src = tmp_path / "s.csv"
+    shutil.copy(examples[0], src)
+    cache = ScanCache(tmp_path / "cache")
+    cache.put(str(src), scan_statement(str(src)))
+    cache.save()
+    src.unlink()
+    cache.save()
+    assert list((tmp_path / "cache" / "partials").iterdir()) == []
+
+
+def test_caches_sharing_a_directory_keep_each_others_partials(tmp_path, examples):
+    a, b = tmp_path / "a.csv", tmp_path / "b.csv"
+    shutil.copy(examples[0], a)
+    shutil.copy(examples[1], b)
+    first, second = ScanCache(tmp_path / "cache"), ScanCache(tmp_path / "cache")
+    first.put(str(a), scan_statement(str(a)))
+    second.put(str(b), scan_statement(str(b)))
+    first.save()
+    second.save()
+
+    cache = ScanCache(tmp_path / "cache")
+    assert cache.get(str(a)) is not None and cache.get(str(b)) is not None
+    assert len(list((tmp_path / "cache" / "partials").iterdir())) == 2
+
+    # a changed statement drops only its own old partial
+    with open(a, "a") as fh:
+        fh.write("Dividends,Data,USD,2024-01-30,NEW(FAKE) Cash Dividend,1.00\n")
+    first.put(str(a), scan_statement(str(a)))
+    first.save()
+    assert len(list((tmp_path / "cache" / "partials").iterdir())) == 2
+    assert ScanCache(tmp_path / "cache").get(str(b)) is not None
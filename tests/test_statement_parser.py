@@ -0,0 +1,33 @@
+from modules.statement_parser import DividendRow, PeriodRow, TaxRow, iter_statement, scan_statement
+
+STATEMENT = "\n".join([
+    'Statement,Header,Field Name,Field Value',
+    'Statement,Data,Period,"January 1, 2025 - January 31, 2025"',
+    'Trades,Data,Order,Stocks,USD,AAPL,"2025-01-05, 10:00:00",1,100',
+    'Dividends,Data,USD,2025-01-02,AGR(US05351W1036) Cash Dividend,4.4',
+    'Withholding Tax,Data,USD,2025-01-02,AGR(US05351W1036) Cash Dividend,-0.66',
+    'Dividends,Data,EUR,2024-12-30,SAP(DE0007164600) Cash Dividend,2.2',
+    'Dividends,Data,Total,,,6.6',
+])
+
+
+def test_iter_statement_yields_typed_rows(tmp_path):
+    p = tmp_path / "U1_202501_202501.csv"
+    p.write_text(STATEMENT, encoding="utf-8-sig")
+    rows = list(iter_statement(str(p)))
+    assert rows[0] == PeriodRow("2025-01-01", "2025-01-31", "2025")
+    assert rows[1] == DividendRow("USD", "2025-01-02", "AGR", 440)
+    assert rows[2] == TaxRow("USD", "2025-01-02", "AGR", -66)
+    assert len(rows) == 4  # the 'Total' row is dropped
+
+
+def test_scan_statement_collects_fx_needs(tmp_path):
+    p = tmp_path / "U1_202501_202501.csv"
+    p.write_text(STATEMENT, encoding="utf-8")
+    scan = scan_statement(str(p))
+    assert scan.currencies == {"USD": ["2025-01-02", "2025-01-02"], "EUR": ["2024-12-30", "2024-12-30"]}
+    assert (scan.min_date, scan.max_date) == ("2024-12-30", "2025-01-02")
+
+    scan = scan_statement(str(p), "2025")
+    assert list(scan.currencies) == ["USD"]
+    assert len(scan.dividends) == 1 and len(scan.taxes) == 1
@@ -0,0 +1,37 @@
+from modules.pdf_report.year_stats import YearStats
+
+
+def _block():
+    return {
+        "year": "2025",
+        "dividends": [
+            {"ticker": "KO", "currency": "USD", "dividend": [
+                {"date": "2025-01-02", "currency": "USD", "amount": 1.0, "amountPln": 4.01},
+                {"date": "2025-03-02", "currency": "USD", "amount": 3.0, "amountPln": 12.03},
+            ]},
+            {"ticker": "AAPL", "currency": "EUR", "dividend": [
+                {"date": "2025-02-03", "currency": "EUR", "amount": 2.0, "amountPln": 8.6},
+            ]},
+        ],
+        "taxes": [
+            {"ticker": "KO", "currency": "USD", "tax": [
+                {"date": "2025-01-02", "currency": "USD", "amount": -0.15, "amountPln": -0.6},
+            ]},
+        ],
+    }
+
+
+def test_year_stats_single_pass():
+    s = YearStats.from_year_block(_block())
+    assert (s.from_date, s.to_date) == ("2025-01-02", "2025-03-02")
+    assert (s.total_div_pln, s.total_tax_pln, s.div_count, s.tax_count) == (2464, -60, 3, 1)
+    assert s.div_by_ticker == {"AAPL": 860, "KO": 1604} and s.tax_by_ticker == {"KO": -60}
+    assert s.ticker_currency == {"AAPL": "EUR", "KO": "USD"}
+    assert s.per_ccy_pln == {"EUR": 860, "USD": 1544}
+    assert s.months == ["2025-01", "2025-02", "2025-03"] and s.tax_by_month == {"2025-01": -60}
+    assert (s.add_pl_tax, s.pit38_tax, s.pit38_due) == (222, 468, 408)
+
+
+def test_year_stats_empty_year_uses_calendar_period():
+    s = YearStats.from_year_block({"year": "2024", "dividends": [], "taxes": []})
+    assert (s.from_date, s.to_date, s.tickers_count) == ("2024-01-01", "2024-12-31", 0)